@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
-from utils.data_loader import carregar_dados, carregar_acessos
-from utils.helpers import normalizar_sigla, levenshtein
+from utils.data_loader import carregar_inventario
+from utils.helpers import normalizar_sigla
 
 st.set_page_config(page_title="Buscar por SIGLA • Site Radar", page_icon="📡", layout="wide")
 
@@ -107,38 +107,30 @@ def _format_coord(x):
     except Exception:
         return "—"
 
-def _gerar_sugestoes(busca_raw: str, candidatos: list[str], limite: int = 8) -> list[str]:
+def _gerar_sugestoes(busca_raw: str, indice, limite: int = 8) -> list[str]:
     """
     Gera sugestões "parecidas" para a sigla digitada:
-      1) Começa com...
+      1) Começa com... (bisect no índice)
       2) Contém...
       3) Fuzzy (Levenshtein <= 1)
     """
     if not busca_raw:
         return []
     bnorm = normalizar_sigla(busca_raw)
-    pares = [(s, normalizar_sigla(s)) for s in candidatos]
 
     # 1) Começa com...
-    pref = [s for s, n in pares if n.startswith(bnorm)]
+    pref = indice.por_prefixo(bnorm, limite)
     seen = set(pref)
 
     # 2) Contém...
     if len(pref) < limite:
-        cont = [s for s, n in pares if (bnorm in n) and (s not in seen)]
+        cont = indice.contendo(bnorm, limite - len(pref), excluir=seen)
         pref.extend(cont)
         seen.update(cont)
 
-    # 3) Fuzzy leve (<= 1 edição)
+    # 3) Fuzzy leve (<= 1 edição) — kernel vetorizado sobre o índice
     if len(pref) < limite:
-        fuzzy = []
-        for s, n in pares:
-            if s in seen:
-                continue
-            d = levenshtein(n, bnorm)
-            if d <= 1:
-                fuzzy.append((d, s))
-        fuzzy = [s for _, s in sorted(fuzzy, key=lambda x: (x[0], x[1]))]
+        fuzzy = [s for _, s in indice.proximas(bnorm, 1) if s not in seen]
         pref.extend(fuzzy)
 
     # Limita e mantém ordem
@@ -155,11 +147,12 @@ def _select_sugestao(value: str):
 # ==============================
 st.title("🔍 Buscar por SIGLA")
 
-df = carregar_dados()
-acessos = carregar_acessos()
-
-# Lista de siglas únicas (UPPER) para facilitar match
-lista_siglas = sorted(df["sigla"].dropna().astype(str).str.upper().unique().tolist())
+# Uma única versão do inventário por rerun: as posições do índice de
+# SIGLAs só valem para o DataFrame da mesma versão
+inv = carregar_inventario()
+df = inv.enderecos
+mapa_acessos = inv.mapa_acessos
+indice = inv.siglas
 
 # ---------- Estado inicial & hidratação ----------
 if "busca_sigla_input" not in st.session_state:
@@ -187,7 +180,7 @@ busca_val = st.session_state.get("busca_sigla_input", "").strip()
 
 # ---------- Sugestões (chips) ----------
 if busca_val:
-    sugestoes = _gerar_sugestoes(busca_val, lista_siglas, limite=8)
+    sugestoes = _gerar_sugestoes(busca_val, indice, limite=8)
     if sugestoes:
         st.markdown("### 🔎 Sugestões (clique para buscar)")
         st.markdown('<div id="chips-scope">', unsafe_allow_html=True)
@@ -211,24 +204,17 @@ if do_search:
     busca_norm = normalizar_sigla(busca_val)
 
     # 1) Match exato (normalizado)
-    achada = None
-    for s in lista_siglas:
-        if normalizar_sigla(s) == busca_norm:
-            achada = s
-            break
+    achada = indice.exata(busca_val)
 
     # 2) Fuzzy leve (menor distância; <=1 geralmente cobre "faltando 1 letra")
-    if not achada and lista_siglas:
-        dists = [(s, levenshtein(normalizar_sigla(s), busca_norm)) for s in lista_siglas]
-        # Ordena por distância e depois por ordem alfabética
-        dists.sort(key=lambda x: (x[1], x[0]))
-        achada = dists[0][0] if dists else None
+    if not achada:
+        achada = indice.mais_proxima(busca_norm)
 
     with result_ct:
         if achada:
             st.success(f"SIGLA encontrada: **{achada}**")
 
-            dados = df[df["sigla"].astype(str).str.upper() == achada].copy()
+            dados = df.iloc[indice.linhas(achada)]
 
             # Tabela resumida
             cols_show = [c for c in ["sigla", "nome", "detentora", "endereco", "lat", "lon", "capacitado"] if c in dados.columns]
@@ -267,14 +253,8 @@ if do_search:
                     pass
 
                 # Técnicos com acesso liberado (se houver aba acessos)
-                if acessos is not None and not acessos.empty:
-                    tecs = (
-                        acessos[acessos["sigla"].astype(str).str.upper() == sigla_row.upper()]
-                        .get("tecnico", pd.Series(dtype="string"))
-                        .dropna()
-                        .unique()
-                        .tolist()
-                    )
+                if len(mapa_acessos):
+                    tecs = mapa_acessos.tecnicos(sigla_row)
                     if tecs:
                         st.info("👷 **Técnicos com acesso:**\n" + "\n".join([f"- {t}" for t in tecs]))
                     else:
@@ -1,9 +1,7 @@
 import streamlit as st
-import pandas as pd
-from utils.data_loader import carregar_dados, carregar_capacitados_lista
+from utils.data_loader import carregar_inventario
 from utils.geocode import geocode_address
-from utils.helpers import haversine_km
-from utils.osrm_tools import osrm_table
+from utils.ranking import adicionar_rotas, ranquear_erbs
 
 st.set_page_config(page_title="Buscar por ENDEREÇO • Site Radar", page_icon="📡", layout="wide")
 
@@ -90,13 +88,6 @@ with st.sidebar:
 #   AUXILIARES LOCAIS
 # ==============================
 
-YES = {"sim","s","yes","y","1","true","verdadeiro","ok","ativo","habilitado","cap","capacitado"}
-def _is_yes(val) -> bool:
-    try:
-        return str(val).strip().lower() in YES
-    except Exception:
-        return False
-
 def _cap_badge(is_cap: bool) -> str:
     return ' <span class="cap-badge">Capacitado</span>' if is_cap else ""
 
@@ -106,16 +97,15 @@ def _cap_badge(is_cap: bool) -> str:
 
 st.title("🧭 Buscar por ENDEREÇO")
 
-df = carregar_dados()
+# Uma única versão do inventário por rerun: as posições dos índices
+# espaciais só valem para o DataFrame da mesma versão
+inv = carregar_inventario()
+df = inv.enderecos
+espacial = inv.espacial
+espacial_cap = inv.espacial_cap
 
-# Unifica status de capacitado:
-# - Se houver coluna 'capacitado', interpreta SIM/NÃO
-# - Se houver aba separada (carregar_capacitados_lista), une com OR
-siglas_cap_set = carregar_capacitados_lista()  # pode ser None
-siglas_upper = df["sigla"].astype(str).str.upper()
-col_cap_bool = df["capacitado"].apply(_is_yes) if "capacitado" in df.columns else pd.Series([False]*len(df))
-in_set_bool = siglas_upper.isin(siglas_cap_set) if siglas_cap_set else pd.Series([False]*len(df))
-df["_is_capacitado"] = (col_cap_bool | in_set_bool)
+# Status de capacitado já vem unificado do inventário (coluna '_is_capacitado'):
+# coluna 'capacitado' SIM/NÃO OR aba separada de capacitados.
 
 # Criamos um container para os resultados
 result_ct = st.container()
@@ -153,51 +143,26 @@ with result_ct:
     st.write(f"🧭 **Coordenadas:** {lat_cli:.6f}, {lon_cli:.6f}")
 
     # Garantir que existam ERBs válidas
-    base = df.dropna(subset=["lat", "lon"]).copy()
-    if base.empty:
+    if not len(espacial):
         st.error("⚠ Nenhuma ERB possui coordenadas válidas na planilha.")
         st.stop()
 
-    # Calcular distâncias em linha reta
-    base["dist_km"] = haversine_km(lat_cli, lon_cli, base["lat"], base["lon"])
-
     # ================= LÓGICA QUE VOCÊ PEDIU =================
-    # 1) Escolher SEMPRE o capacitado mais próximo (se existir), mesmo que esteja longe
-    base_cap = base[base["_is_capacitado"] == True].copy()
-    forced_cap_row = None
-    if not base_cap.empty:
-        idx_min_cap = base_cap["dist_km"].idxmin()
-        forced_cap_row = base_cap.loc[[idx_min_cap]].copy()  # 1 linha (DataFrame)
-
-    # 2) Pegar os 2 mais próximos (excluindo o capacitado escolhido, se houver)
-    if forced_cap_row is not None:
-        excl_index = forced_cap_row.index[0]
-        restantes = base.drop(index=excl_index).copy()
-        outros2 = restantes.nsmallest(2, "dist_km").copy()
-        # Combinar: capacitado escolhido (primeiro) + dois mais próximos
-        final = pd.concat([forced_cap_row, outros2], ignore_index=True)
-        # Marcar coluna auxiliar para destacar o primeiro capacitado
-        final["_is_forced_cap"] = [True] + [False] * (len(final) - 1)
-    else:
-        # Se não houver capacitado, fica apenas o top-3 normal
-        final = base.nsmallest(3, "dist_km").copy()
-        final["_is_forced_cap"] = [False] * len(final)
+    # 1) SEMPRE o capacitado mais próximo (índice só de capacitados), mesmo que esteja longe
+    # 2) + os 2 mais próximos (excluindo o capacitado escolhido)
+    # Sem capacitado: apenas o top-3 normal
+    # (regra centralizada em utils.ranking, a mesma do processamento em lote)
+    final = ranquear_erbs(df, espacial, espacial_cap, lat_cli, lon_cli, n_outros=2)
 
     # ==========================================================
 
-    # Distância via rota (OSRM)
-    destinos = [(float(r["lat"]), float(r["lon"])) for _, r in final.iterrows()]
-    osrm_out = osrm_table(lat_cli, lon_cli, destinos)
-
-    if osrm_out and len(osrm_out) == len(final):
-        final["dist_rota_km"] = [x["distance_km"] for x in osrm_out]
-        final["tempo_min"]    = [x["duration_min"] for x in osrm_out]
-    else:
-        final["dist_rota_km"] = None
-        final["tempo_min"]    = None
+    # Distância via rota (OSRM; sem resposta a tempo, estimativa local)
+    adicionar_rotas(final, lat_cli, lon_cli)
+    if final["rota_estimada"].any():
+        st.caption("≈ Roteador indisponível no momento: distâncias/tempos de rota marcados com ≈ são estimados.")
 
     # Tabela resumida com info útil
-    mostrar_cols = [c for c in ["sigla","nome","detentora","endereco","lat","lon","capacitado","_is_capacitado","dist_km","dist_rota_km","tempo_min"] if c in final.columns]
+    mostrar_cols = [c for c in ["sigla","nome","detentora","endereco","lat","lon","capacitado","_is_capacitado","dist_km","dist_rota_km","tempo_min","rota_estimada"] if c in final.columns]
     st.markdown("### 📌 Resultado (sempre inclui o capacitado mais próximo, se existir)")
     st.dataframe(final[mostrar_cols], use_container_width=True)
 
@@ -216,10 +181,11 @@ with result_ct:
         maps    = f"https://www.google.com/maps/search/?api=1&query={erb_lat},{erb_lon}"
 
         st.markdown(f"### **{sigla} — {nome}**{cap_md}{first_md}", unsafe_allow_html=True)
+        aprox   = "≈ " if bool(row.get("rota_estimada", False)) else ""
         st.markdown(
             f"🗺️ **Linha reta:** {row['dist_km']:.3f} km  \n"
-            f"🚗 **Distância por rota:** {row.get('dist_rota_km', '—')} km  \n"
-            f"⏱ **Tempo estimado:** {row.get('tempo_min', '—')} min"
+            f"🚗 **Distância por rota:** {aprox}{row.get('dist_rota_km', '—')} km  \n"
+            f"⏱ **Tempo estimado:** {aprox}{row.get('tempo_min', '—')} min"
         )
 
         col1, col2 = st.columns(2)
@@ -1,13 +1,13 @@
 import streamlit as st
-import pandas as pd
 from pathlib import Path
 from datetime import datetime
-import os
-import io
-import secrets
 import mimetypes
 
 from utils.data_loader import carregar_dados
+from utils.fila_upload import FilaUpload
+from utils.fotos_db import RegistroFotos
+from utils.imagens import formato_derivado, gerar_derivados
+from utils.ingestao import ingerir
 
 # ========== Config da página ==========
 st.set_page_config(page_title="Fotos de Cadeados • Site Radar", page_icon="🔐", layout="wide")
@@ -77,14 +77,6 @@ def guess_mime(filename: str, default="application/octet-stream"):
     mt, _ = mimetypes.guess_type(filename)
     return mt or default
 
-def safe_filename(sigla: str, original_name: str):
-    base = os.path.basename(original_name)
-    ts = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-    rand = secrets.token_hex(3)  # 6 hex chars
-    # remove espaços e caracteres problemáticos
-    base = base.replace(" ", "_")
-    return f"{sigla}_{ts}_{rand}_{base}"
-
 # ========== Carrega dados ==========
 df = carregar_dados()
 siglas = sorted(df["sigla"].dropna().astype(str).str.upper().unique().tolist())
@@ -123,55 +115,66 @@ with st.form("form_fotos", clear_on_submit=False):
 # ========== Processa upload ==========
 DATA_DIR = ensure_dir(Path("data"))
 LOCKS_DIR = ensure_dir(DATA_DIR / "locks")
-CSV_PATH = DATA_DIR / "locks.csv"
+CSV_PATH = DATA_DIR / "locks.csv"  # formato antigo: migrado uma vez para o SQLite
+DB_PATH = DATA_DIR / "locks.sqlite"
+
+@st.cache_resource(show_spinner=False)
+def registro_fotos() -> RegistroFotos:
+    reg = RegistroFotos(DB_PATH)
+    try:
+        reg.migrar_csv(CSV_PATH)
+    except Exception as e:
+        st.warning(f"Não foi possível migrar o histórico do CSV: {e}")
+    return reg
+
+registro = registro_fotos()
 
 client = supabase_client()
 bucket = st.secrets.get("SUPABASE_BUCKET", "site-locks")
 table_name = st.secrets.get("SUPABASE_TABLE", None)
 
-def save_metadata_local(row: dict):
-    df_new = pd.DataFrame([row])
-    if CSV_PATH.exists():
-        df_new.to_csv(CSV_PATH, mode="a", header=False, index=False, encoding="utf-8")
-    else:
-        df_new.to_csv(CSV_PATH, mode="w", header=True, index=False, encoding="utf-8")
-
-def save_metadata_supabase(row: dict):
-    if not client or not table_name:
-        return None
-    try:
-        res = client.table(table_name).insert(row).execute()
-        return res
-    except Exception as e:
-        st.warning(f"Não foi possível inserir metadados na tabela '{table_name}': {e}")
+# Envio para a nuvem em segundo plano (só com Supabase configurado)
+@st.cache_resource(show_spinner=False)
+def fila_upload(_client) -> FilaUpload | None:
+    if not _client:
         return None
+    return FilaUpload(DB_PATH, registro, _client, bucket, table_name).iniciar()
 
-def upload_to_supabase(sigla: str, file_name: str, file_bytes: bytes, mime: str) -> str | None:
-    if not client:
-        return None
-    try:
-        path = f"{sigla}/{file_name}"
-        # upload
-        client.storage.from_(bucket).upload(
-            file=file_bytes,
-            path=path,
-            file_options={"content-type": mime, "upsert": False}
-        )
-        # public URL
-        public_url = client.storage.from_(bucket).get_public_url(path)
-        return public_url
-    except Exception as e:
-        st.warning(f"Upload no Supabase falhou: {e}")
-        return None
+fila = fila_upload(client)
+
+def save_metadata_local(row: dict) -> int:
+    return registro.inserir(row)
 
 def upload_local(sigla: str, file_name: str, file_bytes: bytes) -> str:
     dir_sigla = ensure_dir(LOCKS_DIR / sigla)
     dest = dir_sigla / file_name
+    ensure_dir(dest.parent)  # derivados vão em subpastas (thumbs/, web/)
     with open(dest, "wb") as f:
         f.write(file_bytes)
     # URL local “simulada” (exibição no Streamlit via st.image)
     return str(dest)  # caminho local
 
+def store_derivatives(sigla: str, original: Path) -> dict:
+    """Miniatura + versão web (orientação EXIF corrigida) ao lado do original."""
+    derivados = gerar_derivados(original)
+    if not derivados:
+        return {}
+    _, ext, _ = formato_derivado()
+    nome = f"{original.stem}.{ext}"
+    return {
+        "thumb_url": upload_local(sigla, f"thumbs/{nome}", derivados["thumb"]),
+        "web_url": upload_local(sigla, f"web/{nome}", derivados["web"]),
+    }
+
+def enqueue_upload(foto_id: int, sigla: str, row: dict, mime: str):
+    """Enfileira original + derivados; no bucket o caminho espelha data/locks/."""
+    _, _, mime_der = formato_derivado()
+    arquivos = {
+        campo: [row[campo], Path(row[campo]).relative_to(LOCKS_DIR).as_posix(), mime if campo == "photo_url" else mime_der]
+        for campo in ("photo_url", "thumb_url", "web_url") if row.get(campo)
+    }
+    fila.enfileirar(foto_id, sigla, arquivos, metadados=row)
+
 if submitted:
     if not sigla_sel:
         st.error("Selecione a **SIGLA**.")
@@ -182,37 +185,56 @@ if submitted:
         # consolidar tipo
         lock_final = lock_type_outro.strip() if lock_type == "Outro" else lock_type
 
-        # prepara bytes e nome final
-        file_bytes = up.read()
-        final_name = safe_filename(sigla_sel, up.name)
         mime = guess_mime(up.name, "image/jpeg")
-
-        # Tenta nuvem (Supabase); se falhar, salva local
-        public_url = upload_to_supabase(sigla_sel, final_name, file_bytes, mime)
-        if not public_url:
-            # fallback local
-            public_url = upload_local(sigla_sel, final_name, file_bytes)
-
-        # monta metadados
-        row = {
-            "timestamp": ts_now,
-            "sigla": sigla_sel,
-            "lock_type": lock_final,
-            "notes": notes,
-            "photo_url": public_url,
-            "uploaded_by": st.session_state.get("user", "tecnico")  # se quiser capturar um nome depois
-        }
-
-        # salva metadados (local SEMPRE; supabase TABELA se configurado)
-        try:
-            save_metadata_local(row)
-        except Exception as e:
-            st.warning(f"Não foi possível salvar metadados localmente (CSV): {e}")
-
-        save_metadata_supabase(row)  # ignora erros silenciosamente (já avisado no warn)
-
-        st.success("✅ Foto salva com sucesso!")
-        st.session_state["last_upload_sigla"] = sigla_sel
+        ext = Path(up.name).suffix or mimetypes.guess_extension(mime) or ".jpg"
+
+        # Copia em blocos calculando o SHA-256; o arquivo se chama pelo hash.
+        # Foto já registrada para a SIGLA (mesmo com outra extensão) não
+        # chega a ganhar nome final: nenhum arquivo órfão fica na pasta.
+        sha, original, _ = ingerir(
+            up, LOCKS_DIR / sigla_sel, ext,
+            duplicada=lambda s: registro.por_hash(sigla_sel, s) is not None,
+        )
+        if original is None:
+            # Mesma foto reenviada: nada é gravado nem enviado de novo
+            existente = registro.por_hash(sigla_sel, sha) or {}
+            st.info(f"ℹ️ Esta foto já estava cadastrada para {sigla_sel} ({existente.get('timestamp', '')}).")
+            st.session_state["last_upload_sigla"] = sigla_sel
+        else:
+            # Grava local primeiro (rápido); a nuvem fica com a fila em segundo plano
+            public_url = str(original)
+            # Derivados leves para a galeria (se a imagem puder ser aberta)
+            derivados = store_derivatives(sigla_sel, original)
+
+            # monta metadados
+            row = {
+                "timestamp": ts_now,
+                "sigla": sigla_sel,
+                "lock_type": lock_final,
+                "notes": notes,
+                "photo_url": public_url,
+                "uploaded_by": st.session_state.get("user", "tecnico"),  # se quiser capturar um nome depois
+                "sha256": sha,
+                **derivados,
+            }
+
+            # salva metadados (local SEMPRE; supabase via fila, se configurado)
+            foto_id = None
+            try:
+                foto_id = save_metadata_local(row)
+            except Exception as e:
+                st.warning(f"Não foi possível salvar metadados localmente: {e}")
+
+            if fila and foto_id is not None:
+                try:
+                    enqueue_upload(foto_id, sigla_sel, row, mime)
+                except Exception as e:
+                    st.warning(f"Não foi possível agendar o envio para a nuvem: {e}")
+
+            st.success("✅ Foto salva com sucesso!")
+            if fila:
+                st.caption("☁️ O envio para a nuvem continua em segundo plano.")
+            st.session_state["last_upload_sigla"] = sigla_sel
 
 # ========== Galeria recente por SIGLA ==========
 st.markdown("### 🖼️ Últimas fotos da SIGLA")
@@ -221,14 +243,14 @@ sig_ref = sigla_sel or st.session_state.get("last_upload_sigla", None)
 if not sig_ref:
     st.info("Selecione uma SIGLA para ver a galeria.")
 else:
-    # tenta ler do Supabase table; senão do CSV; senão do diretório local
+    # tenta ler do Supabase table; senão do registro local; senão do diretório local
     rows = []
     used_source = None
     if client and table_name:
         try:
             res = (
                 client.table(table_name)
-                .select("timestamp,sigla,lock_type,notes,photo_url")
+                .select("*")
                 .eq("sigla", sig_ref)
                 .order("timestamp", desc=True)
                 .limit(12)
@@ -240,13 +262,23 @@ else:
         except Exception:
             rows = []
 
-    if not rows and CSV_PATH.exists():
+        # Fotos deste servidor que ainda estão na fila de envio
+        if rows and fila:
+            try:
+                na_fila = [r for r in registro.ultimas(sig_ref, limite=12) if fila.pendente(r["id"])]
+            except Exception:
+                na_fila = []
+            if na_fila:
+                rows = sorted(
+                    na_fila + rows,
+                    key=lambda r: str(r.get("timestamp") or "").replace("T", " "),
+                    reverse=True,
+                )[:12]
+
+    if not rows:
         try:
-            df_meta = pd.read_csv(CSV_PATH, encoding="utf-8")
-            df_meta = df_meta[df_meta["sigla"].astype(str).str.upper() == sig_ref]
-            df_meta = df_meta.sort_values("timestamp", ascending=False).head(12)
-            rows = df_meta.to_dict(orient="records")
-            used_source = "csv_local"
+            rows = registro.ultimas(sig_ref, limite=12)
+            used_source = "sqlite_local"
         except Exception:
             rows = []
 
@@ -254,7 +286,7 @@ else:
     if not rows:
         dir_sigla = LOCKS_DIR / sig_ref
         if dir_sigla.exists():
-            files = sorted(dir_sigla.glob("*"), key=lambda p: p.stat().st_mtime, reverse=True)[:12]
+            files = sorted((p for p in dir_sigla.glob("*") if p.is_file()), key=lambda p: p.stat().st_mtime, reverse=True)[:12]
             rows = [{"timestamp": "", "sigla": sig_ref, "lock_type": "", "notes": "", "photo_url": str(p)} for p in files]
             used_source = "dir_local"
 
@@ -265,12 +297,15 @@ else:
         for i, r in enumerate(rows):
             with cols[i % 3]:
                 st.markdown('<div class="card">', unsafe_allow_html=True)
-                # se URL for local, usa st.image; se for pública, também funciona
+                # Miniatura por padrão; o original (pesado) só sob demanda.
                 # Streamlit lida com URL http(s) ou caminho local
-                st.image(r["photo_url"], use_column_width=True)
+                st.image(r.get("thumb_url") or r["photo_url"], use_column_width=True)
+                if r.get("thumb_url") and st.toggle("Ampliar", key=f"orig_{sig_ref}_{i}"):
+                    st.image(r.get("web_url") or r["photo_url"], use_column_width=True)
+                    if str(r["photo_url"]).startswith("http"):
+                        st.markdown(f"[Abrir original]({r['photo_url']})")
                 caption = f"**{r.get('lock_type','')}** — {r.get('timestamp','')}"
                 if r.get("notes"):
                     caption += f"\n\n*{r['notes']}*"
                 st.caption(caption)
                 st.markdown('</div>', unsafe_allow_html=True)
-``
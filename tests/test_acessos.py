@@ -0,0 +1,37 @@
+import pandas as pd
+
+from utils.acessos import MapaAcessos
+
+# =========================================================
+#  Mapa de acessos: SIGLA <-> técnicos
+# =========================================================
+
+
+def _acessos():
+    return pd.DataFrame({
+        "sigla": ["rj001 ", "RJ001", "RJ001", "RJ002", None, "RJ003", ""],
+        "tecnico": ["José  da Silva", "JOSE DA SILVA", "Ana", "José da Silva", "Bia", None, "Caio"],
+    })
+
+
+def test_por_sigla_sem_repetir_tecnico():
+    mapa = MapaAcessos(_acessos())
+    assert mapa.tecnicos(" rj001") == ("José  da Silva", "Ana")
+    assert mapa.tecnicos("RJ002") == ("José da Silva",)
+    assert mapa.tecnicos("RJ003") == ()
+    assert mapa.tecnicos(None) == ()
+    assert len(mapa) == 2
+
+
+def test_por_tecnico_com_nome_normalizado():
+    mapa = MapaAcessos(_acessos())
+    assert mapa.siglas("jose da silva") == ("RJ001", "RJ002")
+    assert mapa.siglas("ANA") == ("RJ001",)
+    assert mapa.siglas("Bia") == ()
+
+
+def test_sem_aba_de_acessos():
+    for acessos in (None, pd.DataFrame(columns=["sigla", "tecnico"])):
+        mapa = MapaAcessos(acessos)
+        assert len(mapa) == 0
+        assert mapa.tecnicos("RJ001") == () and mapa.siglas("Ana") == ()
@@ -0,0 +1,89 @@
+from utils.fila_upload import FilaUpload
+from utils.fotos_db import RegistroFotos
+
+# =========================================================
+#  Fila de envio: fallback de colunas só para "coluna ausente"
+# =========================================================
+
+
+class ErroPostgrest(Exception):
+    """Mesmo formato do APIError do postgrest (code + message)."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class _Storage:
+    def upload(self, file, path, file_options):
+        file.read()
+
+    def get_public_url(self, remoto):
+        return f"https://exemplo/{remoto}"
+
+
+class _Tabela:
+    def __init__(self, client, linha=None):
+        self.client, self.linha = client, linha
+
+    def insert(self, linha):
+        return _Tabela(self.client, linha)
+
+    def execute(self):
+        if self.client.erros:
+            raise self.client.erros.pop(0)
+        self.client.inseridas.append(self.linha)
+
+
+class _Cliente:
+    def __init__(self, erros=()):
+        self.erros = list(erros)
+        self.inseridas = []
+        self.storage = self
+
+    def from_(self, bucket):
+        return _Storage()
+
+    def table(self, nome):
+        return _Tabela(self)
+
+
+def _fila(tmp_path, client):
+    registro = RegistroFotos(tmp_path / "fotos.db")
+    foto_id = registro.inserir({"timestamp": "t", "sigla": "rj001", "photo_url": "local"})
+    fila = FilaUpload(tmp_path / "fila.db", registro, client, "bucket", tabela="locks")
+    fila.BACKOFF_S = 0.0
+    original = tmp_path / "foto.jpg"
+    original.write_bytes(b"jpg")
+    fila.enfileirar(
+        foto_id, "RJ001",
+        {"photo_url": [str(original), "RJ001/foto.jpg", "image/jpeg"]},
+        {"sigla": "RJ001", "sha256": "abc", "thumb_url": None},
+    )
+    return fila
+
+
+def test_coluna_ausente_grava_sem_opcionais(tmp_path):
+    client = _Cliente([ErroPostgrest("PGRST204", "Could not find the 'sha256' column of 'locks'")])
+    fila = _fila(tmp_path, client)
+
+    assert fila.processar_vencidos()
+    assert fila.pendentes() == 0
+    assert client.inseridas == [{"sigla": "RJ001", "photo_url": "https://exemplo/RJ001/foto.jpg"}]
+
+
+def test_outros_erros_voltam_para_fila_com_linha_completa(tmp_path):
+    client = _Cliente([
+        ErroPostgrest("42501", "new row violates row-level security policy"),
+        TimeoutError("timed out"),
+    ])
+    fila = _fila(tmp_path, client)
+
+    for _ in range(3):
+        fila.processar_vencidos()
+    assert fila.pendentes() == 0
+    assert client.inseridas == [{
+        "sigla": "RJ001", "sha256": "abc", "thumb_url": None,
+        "photo_url": "https://exemplo/RJ001/foto.jpg",
+    }]
@@ -0,0 +1,63 @@
+import sqlite3
+
+from utils.fotos_db import RegistroFotos
+
+# =========================================================
+#  Registro de fotos (SQLite) e migração do locks.csv
+# =========================================================
+
+
+def test_inserir_ultimas_e_por_hash(tmp_path):
+    registro = RegistroFotos(tmp_path / "fotos.db")
+    for i in range(5):
+        registro.inserir({"timestamp": f"2026-01-0{i + 1}", "sigla": " rj001", "sha256": f"h{i}"})
+    registro.inserir({"timestamp": "2026-02-01", "sigla": "RJ002", "sha256": "h0"})
+
+    assert [f["timestamp"] for f in registro.ultimas("rj001", limite=3)] == [
+        "2026-01-05", "2026-01-04", "2026-01-03",
+    ]
+    assert registro.por_hash("RJ001", "h2")["timestamp"] == "2026-01-03"
+    assert registro.por_hash("RJ001", "outro") is None
+    assert registro.por_hash("RJ002", "h0")["sigla"] == "RJ002"
+
+
+def test_migrar_csv_uma_vez(tmp_path):
+    csv_path = tmp_path / "locks.csv"
+    csv_path.write_text(
+        "timestamp,sigla,lock_type,notes,photo_url,uploaded_by\n"
+        "2025-01-01,rj001,Yale,,data/locks/RJ001/a.jpg,tecnico\n"
+        "2025-01-02, ,Yale,sem sigla,,tecnico\n"
+        "2025-01-03,RJ002,Outro,\"nota, com vírgula\",,tecnico\n",
+        encoding="utf-8",
+    )
+    registro = RegistroFotos(tmp_path / "fotos.db")
+
+    assert registro.migrar_csv(csv_path) == 2
+    assert not csv_path.exists() and (tmp_path / "locks.csv.migrado").exists()
+    assert registro.ultimas("RJ001")[0]["photo_url"] == "data/locks/RJ001/a.jpg"
+    assert registro.ultimas("RJ002")[0]["notes"] == "nota, com vírgula"
+
+    # CSV reaparecendo (ex.: backup restaurado) não é importado de novo
+    (tmp_path / "locks.csv.migrado").rename(csv_path)
+    assert RegistroFotos(tmp_path / "fotos.db").migrar_csv(csv_path) is None
+    assert len(registro.ultimas("RJ001")) == 1
+    assert registro.migrar_csv(tmp_path / "nao_existe.csv") is None
+
+
+def test_banco_antigo_ganha_colunas_novas(tmp_path):
+    path = tmp_path / "fotos.db"
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE fotos (id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, sigla TEXT NOT NULL, "
+        "lock_type TEXT, notes TEXT, photo_url TEXT, uploaded_by TEXT)"
+    )
+    con.execute("INSERT INTO fotos (timestamp, sigla) VALUES ('2025-01-01', 'RJ001')")
+    con.commit()
+    con.close()
+
+    registro = RegistroFotos(path)
+    foto_id = registro.inserir({"timestamp": "2026-01-01", "sigla": "RJ001", "sha256": "h"})
+    registro.atualizar_urls(foto_id, {"thumb_url": "https://x/t.webp", "sigla": "ignorado"})
+    nova, antiga = registro.ultimas("RJ001")
+    assert nova["thumb_url"] == "https://x/t.webp" and nova["sigla"] == "RJ001"
+    assert antiga["sha256"] is None
@@ -0,0 +1,106 @@
+import pandas as pd
+
+from utils.gazetteer import Gazetteer, _decompor, construir_gazetteer
+from utils.helpers import normalizar_endereco
+
+# =========================================================
+#  normalizar_endereco + geocodificador local
+# =========================================================
+
+
+def test_normalizar_endereco_variacoes_triviais():
+    base = normalizar_endereco("Rua X, 10 - Centro")
+    assert base == "rua x 10 centro"
+    assert normalizar_endereco("  R. X nº 10, centro ") == base
+    assert normalizar_endereco("RUA X   10 CENTRO") == base
+
+
+def test_normalizar_endereco_acentos_abreviacoes_e_cep():
+    assert normalizar_endereco("Av. Niterói, 5") == "avenida niteroi 5"
+    assert normalizar_endereco("Estr. do Joá 100 CEP 22610-140") == "estrada do joa 100|22610140"
+    assert normalizar_endereco("Praça XV 20040.002") == "praca xv|20040002"
+    assert normalizar_endereco(None) == ""
+
+
+def test_decompor():
+    assert _decompor("rua x 10 centro|20040002") == ("rua x", 10, ["centro"], "20040002")
+    assert _decompor("rua 2 150 niteroi") == ("rua 2", 150, ["niteroi"], None)
+    assert _decompor("rua 7 de setembro 98") == ("rua 7 de setembro", 98, [], None)
+    assert _decompor("rua sem numero") == ("rua sem numero", None, [], None)
+
+
+def _gazetteer():
+    g = Gazetteer()
+    # Mesma rua em dois municípios
+    g.adicionar("Rua Floriano Peixoto, 631", -22.90, -43.10, cidade="Niterói")
+    g.adicionar("Rua Floriano Peixoto, 1200", -22.76, -43.45, cidade="Nova Iguaçu")
+    # Rua só conhecida num ponto sem cidade
+    g.adicionar("Rua das Flores, 100", -22.56, -42.69)
+    # Endereço exato com cidade conhecida
+    g.adicionar("Avenida Central, 45", -22.94, -43.16, cidade="Rio de Janeiro")
+    # CEP específico (pontos próximos), CEP espalhado e CEP genérico de cidade
+    g.adicionar("Rua A, 1", -22.9000, -43.2000, cep="20040-002")
+    g.adicionar("Rua A, 9", -22.9010, -43.2010, cep="20040-002")
+    g.adicionar("Rua B, 1", -22.60, -42.70, cep="21665-180")
+    g.adicionar("Rua C, 1", -22.90, -43.30, cep="21665-180")
+    g.adicionar("Rua D, 1", -22.90, -43.20, cep="26130-000")
+    # Bairro compacto
+    g.adicionar("Rua E, 1", -22.970, -43.180, bairro="Copacabana", cidade="Rio de Janeiro")
+    g.adicionar("Rua F, 2", -22.975, -43.185, bairro="Copacabana", cidade="Rio de Janeiro")
+    return g.finalizar()
+
+
+def test_numero_proximo_na_cidade_certa():
+    g = _gazetteer()
+    lat, lon, rotulo = g.buscar("Rua Floriano Peixoto 600, Niterói")
+    assert (lat, lon) == (-22.90, -43.10) and "nº 631" in rotulo
+    lat, lon, _ = g.buscar("R. Floriano Peixoto 1190 - Nova Iguaçu")
+    assert (lat, lon) == (-22.76, -43.45)
+
+
+def test_outra_cidade_nao_responde():
+    g = _gazetteer()
+    # Mesma rua e número perto, mas em município diferente do citado
+    assert g.buscar("Rua Floriano Peixoto 600 - Nova Iguaçu") is None
+    assert g.buscar("Rua Floriano Peixoto 1190, Niterói") is None
+    # Ponto de cidade desconhecida não responde consulta que cita cidade
+    assert g.buscar("Rua das Flores 120, Niterói") is None
+    # Sem cidade na consulta: rua em dois municípios não é resolvida localmente
+    assert g.buscar("Rua Floriano Peixoto 600") is None
+    assert g.buscar("Rua das Flores 120")[:2] == (-22.56, -42.69)
+
+
+def test_exato_respeita_cidade_citada():
+    g = _gazetteer()
+    assert g.buscar("Avenida Central, 45")[:2] == (-22.94, -43.16)
+    assert g.buscar("Av. Central 45") is not None
+
+
+def test_cep_compacto_espalhado_e_generico():
+    g = _gazetteer()
+    lat, lon, rotulo = g.buscar("Rua Inexistente 12, 20040-002")
+    assert (round(lat, 4), round(lon, 4)) == (-22.9005, -43.2005) and "20040-002" in rotulo
+    assert g.buscar("Rua Inexistente 12, 21665-180") is None
+    assert g.buscar("Rua Inexistente 12, 26130-000") is None
+
+
+def test_bairro_centroide():
+    g = _gazetteer()
+    lat, lon, rotulo = g.buscar("Copacabana, Rio de Janeiro")
+    assert round(lat, 4) == -22.9725 and "aproximado" in rotulo
+    assert g.buscar("Bairro Que Nao Existe") is None
+
+
+def test_construir_gazetteer_cidade_pelo_nome_da_erb(tmp_path):
+    enderecos = pd.DataFrame({
+        "endereco": ["Rua Floriano Peixoto, 631", "Rua Floriano Peixoto, 788"],
+        "nome": ["NITERÓI - CENTRO", "PONTO FRIO (REVENDA)"],
+        "lat": [-22.90, -22.85],
+        "lon": [-43.10, -43.09],
+    })
+    g = construir_gazetteer(enderecos, extrato=tmp_path / "nao_existe.csv.gz")
+    assert g.buscar("Rua Floriano Peixoto 640 Niteroi")[:2] == (-22.90, -43.10)
+    # "PONTO FRIO (REVENDA)" não é município: ponto de cidade desconhecida,
+    # que não responde consulta com cidade (e 631 está longe demais de 790)
+    assert g.buscar("Rua Floriano Peixoto 790 Niteroi") is None
+    assert g.buscar("Rua Floriano Peixoto 790")[:2] == (-22.85, -43.09)
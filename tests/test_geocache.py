@@ -0,0 +1,69 @@
+import pytest
+
+import utils.geocache as geocache
+from utils.geocache import AUSENTE, CacheGeocode
+
+# =========================================================
+#  Cache de geocodificação: TTL, negativos e evicção
+# =========================================================
+
+
+class _Relogio:
+    def __init__(self, agora: float = 1_000_000.0):
+        self.agora = agora
+
+    def time(self) -> float:
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = _Relogio()
+    monkeypatch.setattr(geocache, "time", r)
+    return r
+
+
+def _cache(tmp_path, max_itens=100):
+    return CacheGeocode(tmp_path / "geocode.sqlite", ttl_s=100.0, ttl_negativo_s=10.0, max_itens=max_itens)
+
+
+def test_positivo_negativo_e_ausente(tmp_path, relogio):
+    cache = _cache(tmp_path)
+    cache.salvar("rua x 10", (-22.9, -43.2, "Rua X"))
+    cache.salvar("lugar nenhum", None)
+
+    assert cache.obter("rua x 10") == (-22.9, -43.2, "Rua X")
+    assert cache.obter("lugar nenhum") is None
+    assert cache.obter("nunca buscado") is AUSENTE
+
+
+def test_ttl_negativo_menor_que_positivo(tmp_path, relogio):
+    cache = _cache(tmp_path)
+    cache.salvar("rua x 10", (-22.9, -43.2, "Rua X"))
+    cache.salvar("lugar nenhum", None)
+
+    relogio.agora += 50
+    assert cache.obter("rua x 10") is not AUSENTE
+    assert cache.obter("lugar nenhum") is AUSENTE
+    relogio.agora += 51
+    assert cache.obter("rua x 10") is AUSENTE
+
+
+def test_compartilhado_entre_instancias(tmp_path, relogio):
+    _cache(tmp_path).salvar("rua x 10", (-22.9, -43.2, "Rua X"))
+    assert _cache(tmp_path).obter("rua x 10") == (-22.9, -43.2, "Rua X")
+
+
+def test_evicao_remove_os_menos_acessados(tmp_path, relogio):
+    cache = _cache(tmp_path, max_itens=10)
+    cache.EVICAO_A_CADA = 1
+    cache.TOQUE_S = 0.0
+    cache.salvar("usada", (1.0, 1.0, "u"))
+    for i in range(10):
+        relogio.agora += 1
+        cache.salvar(f"end {i}", (0.0, 0.0, str(i)))
+        cache.obter("usada")  # mantém a marca de acesso sempre recente
+
+    # 11 itens > 10: ficam 9, sem os dois menos acessados
+    presentes = [k for k in ["usada", *(f"end {i}" for i in range(10))] if cache.obter(k) is not AUSENTE]
+    assert presentes == ["usada", *(f"end {i}" for i in range(2, 10))]
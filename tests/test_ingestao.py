@@ -0,0 +1,58 @@
+import hashlib
+import io
+
+import pytest
+
+from utils.ingestao import ingerir
+
+# =========================================================
+#  Ingestão por conteúdo: nome pelo hash, sem órfãos
+# =========================================================
+
+
+def _arquivos(pasta):
+    return sorted(p.name for p in pasta.iterdir())
+
+
+def test_grava_pelo_hash_e_nao_regrava(tmp_path):
+    dados = b"foto" * 300_000  # mais de um bloco
+    sha_esperado = hashlib.sha256(dados).hexdigest()
+
+    sha, caminho, novo = ingerir(io.BytesIO(dados), tmp_path / "RJ001", ".JPG")
+    assert (sha, caminho.name, novo) == (sha_esperado, f"{sha_esperado}.jpg", True)
+    assert caminho.read_bytes() == dados
+
+    origem = io.BytesIO(dados)
+    origem.read(10)  # posição no meio: ingerir relê do início
+    assert ingerir(origem, tmp_path / "RJ001", "jpg") == (sha, caminho, False)
+    assert _arquivos(tmp_path / "RJ001") == [f"{sha}.jpg"]
+
+
+def test_duplicada_nao_deixa_arquivo(tmp_path):
+    pasta = tmp_path / "RJ001"
+    sha, caminho, _ = ingerir(io.BytesIO(b"abc"), pasta, "jpg")
+
+    # Mesmo conteúdo com outra extensão, já registrado: nada novo na pasta
+    vistos = []
+    def registrada(s):
+        vistos.append(s)
+        return s == sha
+    assert ingerir(io.BytesIO(b"abc"), pasta, "png", duplicada=registrada) == (sha, None, False)
+    assert vistos == [sha]
+    assert _arquivos(pasta) == [caminho.name]
+
+    # Conteúdo novo segue normalmente
+    _, outro, novo = ingerir(io.BytesIO(b"xyz"), pasta, "png", duplicada=registrada)
+    assert novo and outro.exists()
+    assert len(_arquivos(pasta)) == 2
+
+
+def test_erro_no_meio_apaga_temporario(tmp_path):
+    class Quebrada(io.BytesIO):
+        def read(self, n=-1):
+            raise OSError("conexão caiu")
+
+    pasta = tmp_path / "RJ001"
+    with pytest.raises(OSError):
+        ingerir(Quebrada(b"abc"), pasta, "jpg")
+    assert _arquivos(pasta) == []
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from utils.espacial import IndiceEspacial, selecionar_com_capacitado, selecionar_com_capacitado_lote
+from utils.helpers import (
+    codificar_strings, haversine_km, haversine_top_k, levenshtein, levenshtein_many, preparar_sitios,
+)
+
+# =========================================================
+#  Kernels vetorizados x força bruta
+# =========================================================
+#
+# Cada kernel otimizado (blocos, float32, KD-tree, DP vetorizada) é
+# comparado com a conta direta. Desempate esperado em todos: distância,
+# depois posição.
+
+
+def _sitios_rj(rng, n: int, repetidos: int = 0, invalidos: int = 0):
+    """Coordenadas na caixa do RJ; alguns pontos repetidos e alguns NaN."""
+    lat = rng.uniform(-23.4, -20.8, n)
+    lon = rng.uniform(-44.9, -40.9, n)
+    if repetidos:
+        origem = rng.integers(0, n, repetidos)
+        destino = rng.choice(n, repetidos, replace=False)
+        lat[destino], lon[destino] = lat[origem], lon[origem]
+    if invalidos:
+        i = rng.choice(n, invalidos, replace=False)
+        lat[i] = np.nan
+    return lat, lon
+
+
+def _forca_bruta(lats, lons, lat, lon, k, posicoes=None):
+    """(posições, km) dos k mais próximos por origem: matriz inteira + lexsort."""
+    posicoes = np.arange(len(lat)) if posicoes is None else np.asarray(posicoes)
+    ok = np.isfinite(lat) & np.isfinite(lon)
+    lat, lon, posicoes = lat[ok], lon[ok], posicoes[ok]
+    d = haversine_km(np.asarray(lats)[:, None], np.asarray(lons)[:, None], lat[None, :], lon[None, :])
+    pos = np.broadcast_to(posicoes, d.shape)
+    ordem = np.lexsort((pos, d), axis=-1)[:, :k]
+    return np.take_along_axis(pos, ordem, axis=1), np.take_along_axis(d, ordem, axis=1)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("memoria_mb", [0.01, 64.0])
+def test_haversine_top_k_igual_forca_bruta(dtype, memoria_mb):
+    rng = np.random.default_rng(18)
+    lat, lon = _sitios_rj(rng, 2000)
+    olat, olon = _sitios_rj(rng, 300)
+
+    idx, dist = haversine_top_k(olat, olon, preparar_sitios(lat, lon, dtype=dtype), 5, memoria_mb=memoria_mb)
+    esperado_idx, esperado_dist = _forca_bruta(olat, olon, lat, lon, 5)
+
+    np.testing.assert_array_equal(idx, esperado_idx)
+    np.testing.assert_allclose(dist, esperado_dist, rtol=0, atol=1e-9)
+
+
+def test_haversine_top_k_k_maior_que_sitios():
+    rng = np.random.default_rng(1)
+    lat, lon = _sitios_rj(rng, 4)
+    idx, dist = haversine_top_k([-22.9], [-43.2], preparar_sitios(lat, lon), 10)
+    esperado_idx, _ = _forca_bruta([-22.9], [-43.2], lat, lon, 4)
+    assert idx.shape == (1, 4)
+    np.testing.assert_array_equal(idx, esperado_idx)
+
+
+def test_k_nearest_arvore_igual_forca_bruta():
+    rng = np.random.default_rng(7)
+    lat, lon = _sitios_rj(rng, 3000, repetidos=300, invalidos=50)
+    indice = IndiceEspacial(lat, lon)
+
+    for qlat, qlon in zip(*_sitios_rj(rng, 200)):
+        pos, dist = indice.k_nearest(qlat, qlon, 5)
+        esperado_pos, esperado_dist = _forca_bruta([qlat], [qlon], lat, lon, 5)
+        np.testing.assert_array_equal(pos, esperado_pos[0])
+        np.testing.assert_allclose(dist, esperado_dist[0], rtol=0, atol=1e-6)
+
+
+def test_k_nearest_arvore_com_predicate():
+    rng = np.random.default_rng(8)
+    lat, lon = _sitios_rj(rng, 1500)
+    indice = IndiceEspacial(lat, lon)
+    pares = np.arange(len(lat)) % 2 == 0
+
+    for qlat, qlon in zip(*_sitios_rj(rng, 50)):
+        pos, _ = indice.k_nearest(qlat, qlon, 3, predicate=lambda p: p % 2 == 0)
+        esperado_pos, _ = _forca_bruta([qlat], [qlon], np.where(pares, lat, np.nan), lon, 3)
+        np.testing.assert_array_equal(pos, esperado_pos[0])
+
+
+def test_k_nearest_lote_igual_arvore_e_forca_bruta():
+    # Muitos pontos repetidos (como no inventário real) exercitam o desempate
+    rng = np.random.default_rng(3)
+    lat, lon = _sitios_rj(rng, 3500, repetidos=500, invalidos=100)
+    posicoes = np.arange(len(lat)) * 3 + 11  # posições != índices internos
+    indice = IndiceEspacial(lat, lon, posicoes=posicoes)
+    olat, olon = _sitios_rj(rng, 400)
+    # Origens exatamente sobre ERBs (inclusive as de ponto repetido)
+    sobre = np.flatnonzero(np.isfinite(lat))[:40]
+    olat[:40], olon[:40] = lat[sobre], lon[sobre]
+
+    pos, dist = indice.k_nearest_lote(olat, olon, 6, memoria_mb=0.05)
+    esperado_pos, esperado_dist = _forca_bruta(olat, olon, lat, lon, 6, posicoes=posicoes)
+    np.testing.assert_array_equal(pos, esperado_pos)
+    np.testing.assert_allclose(dist, esperado_dist, rtol=0, atol=1e-9)
+
+    for i in range(len(olat)):
+        pos_arvore, _ = indice.k_nearest(olat[i], olon[i], 6)
+        np.testing.assert_array_equal(pos[i], pos_arvore)
+
+
+def test_selecionar_com_capacitado_lote_igual_por_origem():
+    rng = np.random.default_rng(5)
+    lat, lon = _sitios_rj(rng, 2500, repetidos=200, invalidos=30)
+    cap = rng.random(len(lat)) < 0.1
+    geral = IndiceEspacial(lat, lon)
+    capacitados = IndiceEspacial(lat[cap], lon[cap], posicoes=np.flatnonzero(cap))
+    olat, olon = _sitios_rj(rng, 300)
+
+    pos, dist, forcado = selecionar_com_capacitado_lote(geral, capacitados, olat, olon, n_outros=2)
+    for i in range(len(olat)):
+        p, d, f = selecionar_com_capacitado(geral, capacitados, olat[i], olon[i], n_outros=2)
+        np.testing.assert_array_equal(pos[i], p)
+        np.testing.assert_allclose(dist[i], d, rtol=0, atol=1e-6)
+        np.testing.assert_array_equal(forcado[i], f)
+
+
+def test_selecionar_com_capacitado_lote_sem_capacitados():
+    rng = np.random.default_rng(6)
+    lat, lon = _sitios_rj(rng, 500)
+    geral = IndiceEspacial(lat, lon)
+    vazio = IndiceEspacial([], [])
+    olat, olon = _sitios_rj(rng, 20)
+
+    pos, _, forcado = selecionar_com_capacitado_lote(geral, vazio, olat, olon, n_outros=2)
+    esperado_pos, _ = _forca_bruta(olat, olon, lat, lon, 3)
+    np.testing.assert_array_equal(pos, esperado_pos)
+    assert not forcado.any()
+
+
+def test_levenshtein_many_igual_escalar():
+    rng = np.random.default_rng(6)
+    alfabeto = list("ABCDEFGHIJ0123ÇÃÉ")
+    candidatos = [
+        "".join(rng.choice(alfabeto, rng.integers(0, 9))) for _ in range(500)
+    ]
+    candidatos += ["", "A", "RJ001", "RJ001"]
+    codificados = codificar_strings(candidatos)
+
+    for _ in range(50):
+        query = "".join(rng.choice(alfabeto, rng.integers(0, 9)))
+        esperado = [levenshtein(query, c) for c in candidatos]
+        np.testing.assert_array_equal(levenshtein_many(query, codificados), esperado)
+        np.testing.assert_array_equal(levenshtein_many(query, candidatos), esperado)
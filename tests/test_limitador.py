@@ -0,0 +1,47 @@
+import threading
+import time
+
+from utils.limitador import LimitadorTaxa
+
+# =========================================================
+#  Limitador de taxa (token bucket) compartilhado
+# =========================================================
+
+
+def test_balde_compartilhado_entre_instancias(tmp_path):
+    path = tmp_path / "limites.sqlite"
+    a = LimitadorTaxa("nominatim", taxa_por_s=0.001, capacidade=2, path=path)
+    b = LimitadorTaxa("nominatim", taxa_por_s=0.001, capacidade=2, path=path)
+    outro = LimitadorTaxa("osrm", taxa_por_s=0.001, capacidade=1, path=path)
+
+    assert a.adquirir(timeout=0) and b.adquirir(timeout=0)
+    # Balde vazio para os dois (mesmo arquivo); provedor diferente não é afetado
+    inicio = time.monotonic()
+    assert not a.adquirir(timeout=0.05)
+    assert time.monotonic() - inicio < 1
+    assert not b.adquirir(timeout=0)
+    assert outro.adquirir(timeout=0)
+
+
+def test_espera_so_o_tempo_do_proximo_token(tmp_path):
+    lim = LimitadorTaxa("rapido", taxa_por_s=20.0, path=tmp_path / "limites.sqlite")
+    assert lim.adquirir()
+    inicio = time.monotonic()
+    assert lim.adquirir()
+    assert 0.02 < time.monotonic() - inicio < 0.5
+
+
+def test_cancelar_nao_consome_token(tmp_path):
+    lim = LimitadorTaxa("lento", taxa_por_s=0.001, path=tmp_path / "limites.sqlite")
+    cancelar = threading.Event()
+    cancelar.set()
+    assert not lim.adquirir(cancelar=cancelar)
+    assert lim.adquirir(timeout=0)
+
+
+def test_sem_sqlite_usa_balde_em_memoria(tmp_path):
+    bloqueio = tmp_path / "arquivo"
+    bloqueio.write_text("não é pasta")
+    lim = LimitadorTaxa("memoria", taxa_por_s=0.001, path=bloqueio / "limites.sqlite")
+    assert lim.adquirir(timeout=0)
+    assert not lim.adquirir(timeout=0)
@@ -0,0 +1,70 @@
+import pytest
+
+import utils.rotacache as rotacache
+from utils.rotacache import CacheRotas
+
+# =========================================================
+#  Cache de rotas por (célula, destino): TTL, lotes e evicção
+# =========================================================
+
+
+class _Relogio:
+    def __init__(self, agora: float = 1_000_000.0):
+        self.agora = agora
+
+    def time(self) -> float:
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = _Relogio()
+    monkeypatch.setattr(rotacache, "time", r)
+    return r
+
+
+def _cache(tmp_path, max_itens=1000):
+    return CacheRotas(tmp_path / "rotas.sqlite", ttl_s=100.0, ttl_negativo_s=10.0, max_itens=max_itens)
+
+
+def test_pares_com_e_sem_rota(tmp_path, relogio):
+    cache = _cache(tmp_path)
+    cache.salvar("c1", {"RJ001": (1200.0, 90.0), "RJ002": None})
+    cache.salvar("c2", {"RJ001": (5000.0, 400.0)})
+
+    assert cache.obter("c1", ["RJ001", "RJ002", "RJ003"]) == {"RJ001": (1200.0, 90.0), "RJ002": None}
+    assert cache.obter("c2", ["RJ002"]) == {}
+    assert sorted(cache.amostra()) == [("c1", "RJ001", 1200.0, 90.0), ("c2", "RJ001", 5000.0, 400.0)]
+
+
+def test_consulta_em_lotes(tmp_path, relogio):
+    cache = _cache(tmp_path)
+    cache.LOTE_CONSULTA = 7
+    valores = {f"RJ{i:03d}": (float(i), float(i)) for i in range(50)}
+    cache.salvar("c1", valores)
+    assert cache.obter("c1", list(valores) + ["NAO"]) == valores
+
+
+def test_ttl_negativo_menor_que_positivo(tmp_path, relogio):
+    cache = _cache(tmp_path)
+    cache.salvar("c1", {"RJ001": (1200.0, 90.0), "RJ002": None})
+
+    relogio.agora += 50
+    assert cache.obter("c1", ["RJ001", "RJ002"]) == {"RJ001": (1200.0, 90.0)}
+    relogio.agora += 51
+    assert cache.obter("c1", ["RJ001", "RJ002"]) == {}
+
+
+def test_evicao_com_chave_composta(tmp_path, relogio):
+    cache = _cache(tmp_path, max_itens=10)
+    cache.EVICAO_A_CADA = 1
+    cache.TOQUE_S = 0.0
+    cache.salvar("c0", {"RJ000": (1.0, 1.0)})
+    for i in range(1, 11):
+        relogio.agora += 1
+        cache.salvar(f"c{i}", {"RJ000": (1.0, 1.0)})
+        cache.obter("c0", ["RJ000"])  # mantém a marca de acesso sempre recente
+
+    # 11 pares > 10: ficam 9, sem os dois menos acessados
+    presentes = [f"c{i}" for i in range(11) if cache.obter(f"c{i}", ["RJ000"])]
+    assert presentes == ["c0", *(f"c{i}" for i in range(3, 11))]
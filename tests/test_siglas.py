@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from utils.helpers import levenshtein, levenshtein_limitado, levenshtein_many
+from utils.siglas import IndiceSiglas
+
+# =========================================================
+#  Índice de SIGLAs (exata, prefixo, linhas, fuzzy)
+# =========================================================
+
+
+def _indice():
+    return IndiceSiglas(pd.Series(["rj001", "RJ001", "RJ002", "RJ-010", "SPX", "ABC", None, "AB"]))
+
+
+def test_exata_prefixo_e_linhas():
+    ind = _indice()
+    assert ind.exata("rj 001") == "RJ001"
+    assert ind.exata("ZZZ") is None
+    # por_prefixo recebe a busca já normalizada ("RJ0" -> "0")
+    assert ind.por_prefixo("0") == ["RJ001", "RJ002", "RJ-010"]
+    assert ind.por_prefixo("0", limite=1) == ["RJ001"]
+    np.testing.assert_array_equal(ind.linhas("RJ001"), [0, 1])
+    assert len(ind.linhas("NAO")) == 0
+
+
+def test_levenshtein_limitado_igual_escalar_dentro_do_limite():
+    rng = np.random.default_rng(5)
+    alfabeto = list("ABCD01")
+    for _ in range(2000):
+        a = "".join(rng.choice(alfabeto, rng.integers(0, 7)))
+        b = "".join(rng.choice(alfabeto, rng.integers(0, 7)))
+        limite = int(rng.integers(0, 4))
+        d = levenshtein(a, b)
+        assert levenshtein_limitado(a, b, limite) == (d if d <= limite else limite + 1)
+
+
+def test_proximas_e_mais_proxima_iguais_a_varredura_completa():
+    rng = np.random.default_rng(11)
+    alfabeto = list("ABCDEFGH0123")
+    siglas = ["".join(rng.choice(alfabeto, rng.integers(2, 6))) for _ in range(3000)]
+    ind = IndiceSiglas(pd.Series(siglas))
+
+    for _ in range(200):
+        q = "".join(rng.choice(alfabeto, rng.integers(1, 6)))
+        dist = levenshtein_many(q, ind.fuzzy)
+        for k in (0, 1, 2):
+            esperado = sorted(
+                (int(dist[i]), s)
+                for i in np.flatnonzero(dist <= k)
+                for s in ind._originais_de[ind._normas_unicas[i]]
+            )
+            assert ind.proximas(q, k) == esperado
+        empatadas = np.flatnonzero(dist == dist.min())
+        assert ind.mais_proxima(q) == min(
+            s for i in empatadas for s in ind._originais_de[ind._normas_unicas[i]]
+        )
+
+
+def test_indice_vazio():
+    ind = IndiceSiglas(pd.Series([], dtype=object))
+    assert ind.mais_proxima("RJ1") is None
+    assert ind.proximas("RJ1", 1) == []
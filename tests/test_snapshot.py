@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.snapshot import (
+    assinatura_arquivo, caminho_snapshot, gravar_snapshot, hash_arquivo, ler_snapshot,
+)
+
+# =========================================================
+#  Snapshot colunar: ida e volta e validade pela planilha
+# =========================================================
+
+
+def _tabelas():
+    return {
+        "enderecos": pd.DataFrame({
+            "sigla": pd.Series(["RJ001", None, "RJ-ÇÃ"], dtype="string"),
+            "lat": [-22.9, np.nan, -23.0],
+            "_is_capacitado": [True, False, True],
+        }),
+        "capacitados": pd.DataFrame({"sigla": pd.Series([], dtype="string")}),
+    }
+
+
+def _planilha(tmp_path, conteudo=b"v1"):
+    origem = tmp_path / "enderecos.xlsx"
+    origem.write_bytes(conteudo)
+    return origem
+
+
+def _gravar(origem, tabelas):
+    gravar_snapshot(origem, tabelas, assinatura_arquivo(origem), hash_arquivo(origem))
+
+
+def test_ida_e_volta_preserva_tipos_e_nulos(tmp_path):
+    origem = _planilha(tmp_path)
+    tabelas = _tabelas()
+    _gravar(origem, tabelas)
+
+    lido = ler_snapshot(origem)
+    assert set(lido) == set(tabelas)
+    for nome, df in tabelas.items():
+        pd.testing.assert_frame_equal(lido[nome], df)
+
+
+def test_planilha_alterada_invalida_snapshot(tmp_path):
+    origem = _planilha(tmp_path)
+    _gravar(origem, _tabelas())
+    origem.write_bytes(b"v2 maior")
+    assert ler_snapshot(origem) is None
+
+
+def test_planilha_tocada_sem_mudar_reaproveita_pelo_hash(tmp_path):
+    origem = _planilha(tmp_path)
+    _gravar(origem, _tabelas())
+    st_ = origem.stat()
+    os.utime(origem, ns=(st_.st_atime_ns, st_.st_mtime_ns + 10**9))
+
+    assert ler_snapshot(origem) is not None
+    # a assinatura nova foi regravada: a próxima leitura nem calcula hash
+    assert ler_snapshot(origem, assinatura_arquivo(origem)) is not None
+
+
+def test_chave_e_da_leitura_nao_do_arquivo_atual(tmp_path):
+    # Assinatura/hash tirados antes do parse; planilha trocada no meio:
+    # o snapshot fica sob a chave antiga e não serve para o arquivo novo.
+    origem = _planilha(tmp_path)
+    assinatura, sha = assinatura_arquivo(origem), hash_arquivo(origem)
+    origem.write_bytes(b"v2 maior")
+    gravar_snapshot(origem, _tabelas(), assinatura, sha)
+    assert ler_snapshot(origem) is None
+
+
+def test_snapshot_corrompido_ou_ausente(tmp_path):
+    origem = _planilha(tmp_path)
+    assert ler_snapshot(origem) is None
+    caminho_snapshot(origem).write_bytes(b"lixo")
+    assert ler_snapshot(origem) is None
@@ -0,0 +1,54 @@
+from typing import Optional
+
+import pandas as pd
+
+from utils.helpers import normalizar_nome
+
+# =========================================================
+#  Mapa de acessos: SIGLA <-> técnicos
+# =========================================================
+
+
+class MapaAcessos:
+    """
+    Aba 'acessos' indexada uma vez junto com o inventário.
+      - por_sigla:   SIGLA (uppercase) -> tupla de técnicos (nome como na
+                     planilha, sem repetição, na ordem em que aparecem)
+      - por_tecnico: nome normalizado -> tupla de SIGLAs, ordenada
+    Técnicos são comparados por normalizar_nome ("José  da Silva" e
+    "JOSE DA SILVA" são a mesma pessoa).
+    """
+
+    def __init__(self, acessos: Optional[pd.DataFrame]):
+        self.por_sigla: dict[str, tuple[str, ...]] = {}
+        self.por_tecnico: dict[str, tuple[str, ...]] = {}
+        if acessos is None or acessos.empty:
+            return
+
+        df = pd.DataFrame({
+            "sigla": acessos["sigla"].astype("string").str.strip().str.upper(),
+            "tecnico": acessos["tecnico"].astype("string").str.strip(),
+        }).dropna()
+        df = df[(df["sigla"] != "") & (df["tecnico"] != "")]
+        df["norma"] = df["tecnico"].map(normalizar_nome)
+        df = df.drop_duplicates(subset=["sigla", "norma"])
+
+        self.por_sigla = {
+            str(s): tuple(g.tolist()) for s, g in df.groupby("sigla", sort=False)["tecnico"]
+        }
+        self.por_tecnico = {
+            str(n): tuple(sorted(g.tolist())) for n, g in df.groupby("norma", sort=False)["sigla"]
+        }
+
+    def __len__(self) -> int:
+        return len(self.por_sigla)
+
+    def tecnicos(self, sigla: str) -> tuple[str, ...]:
+        """Técnicos com acesso à SIGLA (O(1); vazio se nenhum)."""
+        if not isinstance(sigla, str):
+            return ()
+        return self.por_sigla.get(sigla.strip().upper(), ())
+
+    def siglas(self, tecnico: str) -> tuple[str, ...]:
+        """SIGLAs que o técnico pode abrir (O(1); vazio se nenhuma)."""
+        return self.por_tecnico.get(normalizar_nome(tecnico), ())
@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+# =========================================================
+#  Base dos arquivos SQLite locais (caches, fotos, fila, limites)
+# =========================================================
+#
+# Um arquivo compartilhado entre threads e processos: modo WAL (leitores
+# não bloqueiam a gravação), synchronous=NORMAL, autocommit e UMA conexão
+# por thread (cada sessão do Streamlit roda no seu thread). O esquema é
+# aplicado na primeira conexão do processo.
+#
+# CacheSQLite acrescenta o que os caches têm em comum: TTL (positivo e
+# negativo), LRU aproximado pela coluna 'acessado' e limite de tamanho.
+
+
+class BancoSQLite:
+    SCHEMA = ""
+    TIMEOUT_S = 10.0
+    ROW_FACTORY = None
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._pronto = False
+        self._pronto_lock = threading.Lock()
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            if not self._pronto:
+                self._preparar_arquivo()
+            con = sqlite3.connect(self.path, timeout=self.TIMEOUT_S, isolation_level=None)
+            con.execute("PRAGMA synchronous=NORMAL")
+            if self.ROW_FACTORY is not None:
+                con.row_factory = self.ROW_FACTORY
+            self._local.con = con
+        return con
+
+    def _preparar_arquivo(self) -> None:
+        with self._pronto_lock:
+            if self._pronto:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=self.TIMEOUT_S, isolation_level=None)
+            try:
+                con.execute("PRAGMA journal_mode=WAL")
+                con.executescript(self.SCHEMA)
+                self._migrar(con)
+            finally:
+                con.close()
+            self._pronto = True
+
+    def _migrar(self, con: sqlite3.Connection) -> None:
+        """Ajustes em arquivos criados por versões anteriores (subclasses)."""
+
+
+class CacheSQLite(BancoSQLite):
+    """
+    A tabela TABELA precisa das colunas 'criado' e 'acessado' (epoch) e de
+    um índice em 'acessado'; COLUNAS_CHAVE é a chave primária.
+    """
+    TABELA = ""
+    COLUNAS_CHAVE: tuple = ()
+    TIMEOUT_S = 5.0
+    # Só regrava 'acessado' se a marca tiver mais que isso (LRU aproximado,
+    # evita uma escrita por leitura)
+    TOQUE_S = 3600.0
+    # Verifica o limite de tamanho a cada N gravações
+    EVICAO_A_CADA = 50
+
+    def __init__(self, path: Path, ttl_s: float, ttl_negativo_s: float, max_itens: int):
+        super().__init__(path)
+        self.ttl_s = ttl_s
+        self.ttl_negativo_s = ttl_negativo_s
+        self.max_itens = max_itens
+        self._gravacoes = 0
+        self._con()
+
+    def _valido(self, criado: float, negativo: bool, agora: float) -> bool:
+        return agora - criado <= (self.ttl_negativo_s if negativo else self.ttl_s)
+
+    def _tocar(self, acessados: list, chaves: list[tuple], agora: float) -> None:
+        """Atualiza 'acessado' das chaves cuja marca passou de TOQUE_S."""
+        linhas = [(agora, *k) for a, k in zip(acessados, chaves) if agora - a > self.TOQUE_S]
+        if not linhas:
+            return
+        onde = " AND ".join(f"{c} = ?" for c in self.COLUNAS_CHAVE)
+        try:
+            self._con().executemany(f"UPDATE {self.TABELA} SET acessado = ? WHERE {onde}", linhas)
+        except sqlite3.Error:
+            pass
+
+    def _gravou(self) -> None:
+        self._gravacoes += 1
+        if self._gravacoes % self.EVICAO_A_CADA == 0:
+            self._evitar_excesso()
+
+    def _evitar_excesso(self) -> None:
+        """Remove as entradas menos acessadas até ficar ~10% abaixo de max_itens."""
+        chave = ", ".join(self.COLUNAS_CHAVE)
+        if len(self.COLUNAS_CHAVE) > 1:
+            chave = f"({chave})"
+        try:
+            con = self._con()
+            total = con.execute(f"SELECT COUNT(*) FROM {self.TABELA}").fetchone()[0]
+            if total <= self.max_itens:
+                return
+            excesso = total - int(self.max_itens * 0.9)
+            con.execute(
+                f"DELETE FROM {self.TABELA} WHERE {chave} IN "
+                f"(SELECT {', '.join(self.COLUNAS_CHAVE)} FROM {self.TABELA} ORDER BY acessado LIMIT ?)",
+                (excesso,),
+            )
+        except sqlite3.Error:
+            pass
+
@@ -0,0 +1,17 @@
+import os
+
+import streamlit as st
+
+
+def obter_config(nome: str, padrao=None):
+    """
+    Lê uma configuração: st.secrets -> variável de ambiente -> padrão.
+    Não exige secrets.toml (scripts de linha de comando usam só o ambiente).
+    """
+    try:
+        valor = st.secrets.get(nome)
+    except Exception:
+        valor = None
+    if valor is None or valor == "":
+        valor = os.environ.get(nome)
+    return padrao if valor is None or valor == "" else valor
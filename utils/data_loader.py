@@ -1,94 +1,126 @@
 # utils/data_loader.py
+import threading
+import time
 import streamlit as st
+import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Set
 
+from utils.acessos import MapaAcessos
+from utils.espacial import IndiceEspacial
+from utils.gazetteer import Gazetteer, construir_gazetteer
+from utils.helpers import find_col, to_numeric_series
+from utils.siglas import IndiceSiglas
+from utils.snapshot import assinatura_arquivo, gravar_snapshot, hash_arquivo, ler_snapshot
+
 EXCEL_PATH = Path("enderecos.xlsx")
 
 # =========================================================
-#  Helpers
+#  Leitura única do workbook
 # =========================================================
 
-def _to_numeric_series(s: pd.Series) -> pd.Series:
+ABAS_CAPACITADOS = ["capacitados", "capacitacao", "cap_ativos"]
+ABAS_USADAS = ["enderecos", "acessos", *ABAS_CAPACITADOS]
+
+
+class PlanilhaInvalida(Exception):
+    """Aba 'enderecos' ausente/ilegível ou sem as colunas essenciais."""
+
+    def __init__(self, mensagem: str, colunas: Optional[list[str]] = None):
+        super().__init__(mensagem)
+        self.colunas = colunas
+
+
+def _ler_abas() -> dict[str, pd.DataFrame]:
     """
-    Converte a série para float de forma segura:
-    - Normaliza vírgula para ponto
-    - Converte texto inválido para NaN (sem levantar exceção)
-    Resultado: dtype float64 com NaN (np.nan) onde inválido.
+    Abre 'enderecos.xlsx' UMA vez e lê apenas as abas usadas pelo app
+    (enderecos, acessos e a primeira/qualquer aba de capacitados).
+    Abas inexistentes simplesmente não aparecem no dicionário.
     """
-    if s is None:
-        return pd.Series(dtype="float64")
-    s2 = (
-        s.astype(str)
-         .str.strip()
-         .str.replace(",", ".", regex=False)
-         .replace({"": None, "nan": None, "None": None, "-": None, "—": None})
-    )
-    # Converte qualquer coisa não numérica para NaN
-    return pd.to_numeric(s2, errors="coerce")
+    try:
+        with pd.ExcelFile(EXCEL_PATH, engine="openpyxl") as xls:
+            presentes = [sh for sh in ABAS_USADAS if sh in xls.sheet_names]
+            abas = {}
+            for sh in presentes:
+                try:
+                    abas[sh] = xls.parse(sh)
+                except Exception:
+                    if sh == "enderecos":
+                        raise
+            return abas
+    except Exception as e:
+        raise PlanilhaInvalida(f"❌ Erro ao ler o Excel: {e}") from e
 
 
-def _find_col(df: pd.DataFrame, candidates: list[str]) -> Optional[str]:
-    """Acha coluna por nome exato (case-insensitive) ou contendo o termo."""
-    if df is None or df.empty:
-        return None
-    cols_lc_map = {c.lower(): c for c in df.columns}
-    # Match exato
-    for cand in candidates:
-        key = cand.lower()
-        if key in cols_lc_map:
-            return cols_lc_map[key]
-    # Match contendo
-    for c in df.columns:
-        lc = c.lower()
-        for cand in candidates:
-            if cand.lower() in lc:
-                return c
-    return None
+def _carregar_tabelas(assinatura: dict) -> dict[str, pd.DataFrame]:
+    """
+    Tabelas normalizadas do workbook: 'enderecos' sempre; 'acessos' e
+    'capacitados' (coluna sigla) só quando existirem.
+    Usa o snapshot colunar quando ele ainda corresponde à planilha; caso
+    contrário faz UMA leitura do Excel e regrava o snapshot.
+    'assinatura' é a tirada antes de qualquer leitura; o SHA-256 também é
+    calculado antes do parse, e o snapshot só é gravado se a planilha não
+    mudou durante a leitura (senão o vigia recarrega pela assinatura).
+    """
+    snap = ler_snapshot(EXCEL_PATH, assinatura)
+    if snap is not None and "enderecos" in snap:
+        return snap
+
+    try:
+        sha256 = hash_arquivo(EXCEL_PATH)
+    except OSError as e:
+        raise PlanilhaInvalida(f"❌ Erro ao ler o Excel: {e}") from e
+    abas = _ler_abas()
+    tabelas = {"enderecos": _normalizar_enderecos(abas.get("enderecos"))}
+
+    acessos = _normalizar_acessos(abas.get("acessos"))
+    if acessos is not None:
+        tabelas["acessos"] = acessos
+
+    capacitados = _normalizar_capacitados(abas)
+    if capacitados is not None:
+        tabelas["capacitados"] = pd.DataFrame(
+            {"sigla": pd.Series(sorted(capacitados), dtype="string")}
+        )
+
+    try:
+        if assinatura_arquivo(EXCEL_PATH) == assinatura:
+            gravar_snapshot(EXCEL_PATH, tabelas, assinatura, sha256)
+    except OSError:
+        pass  # pasta somente leitura / arquivo sendo trocado: segue sem snapshot
+
+    return tabelas
 
 
 # =========================================================
-#  Carregador principal — Aba ENDERECOS
+#  Normalizadores por aba
 # =========================================================
 
-@st.cache_data(show_spinner=False)
-def carregar_dados() -> pd.DataFrame:
+def _normalizar_enderecos(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     """
-    Lê 'enderecos.xlsx' > aba 'enderecos'
-    Normaliza colunas para:
-      sigla, nome, endereco, detentora, lat, lon, capacitado
+    Normaliza a aba 'enderecos' para:
+      sigla, nome, endereco, detentora, capacitado, lat, lon
     Trata coordenadas inválidas convertendo-as para NaN (sem erro).
+    Levanta PlanilhaInvalida se a aba faltar, estiver vazia ou incompleta.
     """
-    # ---------- Arquivo existe? ----------
-    if not EXCEL_PATH.exists():
-        st.error("❌ Arquivo `enderecos.xlsx` não foi encontrado na raiz do projeto.")
-        st.stop()
+    if df is None:
+        raise PlanilhaInvalida("❌ A aba **enderecos** não existe no arquivo.")
 
-    # ---------- Ler aba principal ----------
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name="enderecos", engine="openpyxl")
-    except ValueError:
-        st.error("❌ A aba **enderecos** não existe no arquivo.")
-        st.stop()
-    except Exception as e:
-        st.error(f"❌ Erro ao ler o Excel: {e}")
-        st.stop()
-
-    if df is None or df.empty:
-        st.error("❌ A aba `enderecos` está vazia.")
-        st.stop()
+    if df.empty:
+        raise PlanilhaInvalida("❌ A aba `enderecos` está vazia.")
 
     df.columns = df.columns.astype(str).str.strip().str.lower()
 
     # ---------- Detectar colunas ----------
-    col_sig = _find_col(df, ["sigla", "sigla_da_torre"])
-    col_nome = _find_col(df, ["nome", "nome_da_torre"])
-    col_end  = _find_col(df, ["endereco", "endereço"])
-    col_det  = _find_col(df, ["detentora"])
-    col_lat  = _find_col(df, ["lat", "latitude"])
-    col_lon  = _find_col(df, ["lon", "longitude"])
-    col_cap  = _find_col(df, ["capacitado", "habilitado", "ativo", "status"])
+    col_sig = find_col(df, ["sigla", "sigla_da_torre"])
+    col_nome = find_col(df, ["nome", "nome_da_torre"])
+    col_end  = find_col(df, ["endereco", "endereço"])
+    col_det  = find_col(df, ["detentora"])
+    col_lat  = find_col(df, ["lat", "latitude"])
+    col_lon  = find_col(df, ["lon", "longitude"])
+    col_cap  = find_col(df, ["capacitado", "habilitado", "ativo", "status"])
 
     missing = []
     if not col_sig: missing.append("sigla (ex.: sigla / sigla_da_torre)")
@@ -98,57 +130,42 @@ def carregar_dados() -> pd.DataFrame:
     if not col_lon:  missing.append("lon (ex.: lon / longitude)")
 
     if missing:
-        st.error(
+        raise PlanilhaInvalida(
             "❌ Colunas essenciais ausentes na aba `enderecos`:\n\n" +
             "\n".join(f"- {m}" for m in missing) +
-            "\n\n👉 Verifique os nomes das colunas na planilha."
+            "\n\n👉 Verifique os nomes das colunas na planilha.",
+            colunas=list(df.columns),
         )
-        st.write("Colunas detectadas no arquivo:", list(df.columns))
-        st.stop()
 
     # ---------- Construção final ----------
+    vazio = pd.Series(pd.NA, index=df.index, dtype="string")
     out = pd.DataFrame()
     out["sigla"]     = df[col_sig].astype("string").str.strip()
     out["nome"]      = df[col_nome].astype("string").str.strip()
     out["endereco"]  = df[col_end].astype("string").str.strip()
-    out["detentora"] = (df[col_det].astype("string").str.strip() if col_det else pd.Series(pd.NA, index=df.index))
-    out["capacitado"] = (df[col_cap].astype("string").str.strip() if col_cap else pd.Series(pd.NA, index=df.index))
+    out["detentora"] = (df[col_det].astype("string").str.strip() if col_det else vazio)
+    out["capacitado"] = (df[col_cap].astype("string").str.strip() if col_cap else vazio)
 
     # ---------- Coordenadas seguras (sem TypeError) ----------
-    out["lat"] = _to_numeric_series(df[col_lat])  # float64 + NaN onde inválido
-    out["lon"] = _to_numeric_series(df[col_lon])  # float64 + NaN onde inválido
+    out["lat"] = to_numeric_series(df[col_lat])  # float64 + NaN onde inválido
+    out["lon"] = to_numeric_series(df[col_lon])  # float64 + NaN onde inválido
 
     return out
 
 
-# =========================================================
-#  Carregar acessos (se existir)
-# =========================================================
-
-@st.cache_data(show_spinner=False)
-def carregar_acessos() -> Optional[pd.DataFrame]:
+def _normalizar_acessos(df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
     """
-    Lê aba 'acessos', detecta colunas e filtra status 'ok' (quando existir).
+    Aba 'acessos': detecta colunas e filtra status 'ok' (quando existir).
     Retorna DataFrame com colunas: sigla, tecnico. Ou None.
     """
-    if not EXCEL_PATH.exists():
-        return None
-
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name="acessos", engine="openpyxl")
-    except ValueError:
-        return None
-    except Exception:
-        return None
-
     if df is None or df.empty:
         return None
 
     df.columns = df.columns.astype(str).str.strip().str.lower()
 
-    col_sig = _find_col(df, ["sigla", "sigla_da_torre", "site", "torre"])
-    col_tec = _find_col(df, ["tecnico", "técnico", "colaborador", "nome_tecnico"])
-    col_sta = _find_col(df, ["status", "situacao", "situação"])
+    col_sig = find_col(df, ["sigla", "sigla_da_torre", "site", "torre"])
+    col_tec = find_col(df, ["tecnico", "técnico", "colaborador", "nome_tecnico"])
+    col_sta = find_col(df, ["status", "situacao", "situação"])
 
     if not col_sig or not col_tec:
         return None
@@ -168,35 +185,20 @@ def carregar_acessos() -> Optional[pd.DataFrame]:
     return df_out if not df_out.empty else None
 
 
-# =========================================================
-#  (Opcional) Lista de SIGLAs capacitados em aba separada
-# =========================================================
-
-@st.cache_data(show_spinner=False)
-def carregar_capacitados_lista() -> Optional[Set[str]]:
+def _normalizar_capacitados(abas: dict[str, pd.DataFrame]) -> Optional[Set[str]]:
     """
-    Procura abas: 'capacitados', 'capacitacao', 'cap_ativos'
+    Procura abas: 'capacitados', 'capacitacao', 'cap_ativos' (nessa ordem)
     Aceita colunas: 'sigla' e opcional 'status/capacitado/ativo'
     Retorna set de SIGLAs em uppercase ou None.
     """
-    if not EXCEL_PATH.exists():
-        return None
-
-    candidate_sheets = ["capacitados", "capacitacao", "cap_ativos"]
-    for sh in candidate_sheets:
-        try:
-            df = pd.read_excel(EXCEL_PATH, sheet_name=sh, engine="openpyxl")
-        except ValueError:
-            continue
-        except Exception:
-            continue
-
+    for sh in ABAS_CAPACITADOS:
+        df = abas.get(sh)
         if df is None or df.empty:
             continue
 
         df.columns = df.columns.astype(str).str.strip().str.lower()
-        col_sig = _find_col(df, ["sigla", "sigla_da_torre", "site", "torre"])
-        col_sta = _find_col(df, ["status", "capacitado", "ativo", "habilitado"])
+        col_sig = find_col(df, ["sigla", "sigla_da_torre", "site", "torre"])
+        col_sta = find_col(df, ["status", "capacitado", "ativo", "habilitado"])
 
         if not col_sig:
             continue
@@ -216,3 +218,203 @@ def carregar_capacitados_lista() -> Optional[Set[str]]:
             return set(sigs)
 
     return None
+
+
+# =========================================================
+#  Inventário publicado (compartilhado por todas as sessões)
+# =========================================================
+
+INTERVALO_RECARGA_S = 10.0
+
+
+@dataclass(frozen=True)
+class Inventario:
+    """Foto imutável de uma versão da planilha. Não altere os DataFrames."""
+    enderecos: pd.DataFrame
+    acessos: Optional[pd.DataFrame]
+    mapa_acessos: MapaAcessos
+    capacitados: Optional[Set[str]]
+    siglas: IndiceSiglas
+    espacial: IndiceEspacial
+    espacial_cap: IndiceEspacial
+    gazetteer: Gazetteer
+    assinatura: dict
+
+
+VALORES_SIM = {"sim","s","yes","y","1","true","verdadeiro","ok","ativo","habilitado","cap","capacitado"}
+
+
+def _mascara_capacitados(enderecos: pd.DataFrame, capacitados: Optional[Set[str]]) -> np.ndarray:
+    """
+    Status de capacitado unificado (vetorizado), uma posição por linha:
+    coluna 'capacitado' com SIM/NÃO OR SIGLA presente na aba de capacitados.
+    """
+    col_cap = (
+        enderecos["capacitado"].astype("string").str.strip().str.lower()
+        .isin(VALORES_SIM).to_numpy(dtype=bool)
+    )
+    if capacitados:
+        in_set = enderecos["sigla"].astype("string").str.upper().isin(capacitados).to_numpy(dtype=bool)
+        col_cap = col_cap | in_set
+    return col_cap
+
+
+def _construir_inventario() -> Inventario:
+    assinatura = assinatura_arquivo(EXCEL_PATH)
+    tabelas = _carregar_tabelas(assinatura)
+
+    cap = tabelas.get("capacitados")
+    capacitados = set(cap["sigla"].tolist()) if cap is not None and not cap.empty else None
+
+    cap_mask = _mascara_capacitados(tabelas["enderecos"], capacitados)
+    enderecos = tabelas["enderecos"].assign(_is_capacitado=cap_mask)
+    return Inventario(
+        enderecos=enderecos,
+        acessos=tabelas.get("acessos"),
+        mapa_acessos=MapaAcessos(tabelas.get("acessos")),
+        capacitados=capacitados,
+        siglas=IndiceSiglas(enderecos["sigla"]),
+        espacial=IndiceEspacial(enderecos["lat"], enderecos["lon"]),
+        espacial_cap=IndiceEspacial(
+            enderecos["lat"].to_numpy()[cap_mask],
+            enderecos["lon"].to_numpy()[cap_mask],
+            posicoes=np.flatnonzero(cap_mask),
+        ),
+        gazetteer=construir_gazetteer(enderecos),
+        assinatura=assinatura,
+    )
+
+
+class _PublicadorInventario:
+    """
+    Mantém o Inventario atual e um thread que vigia 'enderecos.xlsx'.
+    Quando a planilha muda (e fica estável por dois ciclos), o novo
+    Inventario é montado fora das requisições e publicado com uma única
+    atribuição — as sessões passam a ver a versão nova no próximo rerun,
+    sem limpar cache e sem ninguém esperar pela releitura.
+    """
+
+    def __init__(self, intervalo: float = INTERVALO_RECARGA_S):
+        self.atual = _construir_inventario()
+        self._intervalo = intervalo
+        self._pendente: Optional[dict] = None
+        self._ignorada: Optional[dict] = None
+        threading.Thread(
+            target=self._vigiar, name="vigia-inventario", daemon=True
+        ).start()
+
+    def _vigiar(self):
+        while True:
+            time.sleep(self._intervalo)
+            try:
+                assinatura = assinatura_arquivo(EXCEL_PATH)
+            except OSError:
+                continue  # arquivo sendo substituído/removido: mantém o atual
+
+            if assinatura == self.atual.assinatura or assinatura == self._ignorada:
+                self._pendente = None
+                continue
+
+            # Debounce: só recarrega quando a cópia terminou (assinatura estável)
+            if assinatura != self._pendente:
+                self._pendente = assinatura
+                continue
+
+            try:
+                novo = _construir_inventario()
+            except Exception:
+                self._ignorada = assinatura  # planilha inválida: segue servindo a anterior
+                continue
+
+            self.atual = novo
+            self._pendente = None
+
+
+@st.cache_resource(show_spinner=False)
+def _publicador() -> _PublicadorInventario:
+    return _PublicadorInventario()
+
+
+def obter_inventario() -> Inventario:
+    """
+    Versão publicada do inventário. Só a primeira chamada do processo
+    bloqueia (carga inicial); depois é uma leitura de atributo.
+    Levanta PlanilhaInvalida se a carga inicial falhar.
+    """
+    return _publicador().atual
+
+
+# =========================================================
+#  Carregador principal — Aba ENDERECOS
+# =========================================================
+
+def carregar_inventario() -> Inventario:
+    """
+    Inventário publicado, com as mensagens de erro/parada da página se a
+    planilha faltar ou for inválida. As páginas chamam UMA vez por rerun e
+    tiram dele enderecos/siglas/espacial/espacial_cap: o vigia pode publicar
+    uma versão nova a qualquer momento, e posições de um índice só valem
+    para o DataFrame da mesma versão.
+    """
+    # ---------- Arquivo existe? ----------
+    if not EXCEL_PATH.exists():
+        st.error("❌ Arquivo `enderecos.xlsx` não foi encontrado na raiz do projeto.")
+        st.stop()
+
+    try:
+        return obter_inventario()
+    except PlanilhaInvalida as e:
+        st.error(str(e))
+        if e.colunas is not None:
+            st.write("Colunas detectadas no arquivo:", e.colunas)
+        st.stop()
+
+
+def carregar_dados() -> pd.DataFrame:
+    """
+    Lê 'enderecos.xlsx' > aba 'enderecos'
+    Normaliza colunas para:
+      sigla, nome, endereco, detentora, lat, lon, capacitado
+    + _is_capacitado (bool, já unificado com a aba de capacitados).
+    Trata coordenadas inválidas convertendo-as para NaN (sem erro).
+    Devolve o DataFrame do inventário publicado (compartilhado entre
+    sessões e recarregado em segundo plano): NÃO altere in-place.
+    Para usar junto com os índices, pegue tudo de carregar_inventario().
+    """
+    return carregar_inventario().enderecos
+
+
+# =========================================================
+#  Carregar acessos (se existir)
+# =========================================================
+
+def carregar_acessos() -> Optional[pd.DataFrame]:
+    """
+    Aba 'acessos' normalizada (sigla, tecnico; só status 'ok'). Ou None.
+    Vem da mesma leitura única do workbook usada por carregar_dados.
+    """
+    if not EXCEL_PATH.exists():
+        return None
+
+    try:
+        return obter_inventario().acessos
+    except PlanilhaInvalida:
+        return None
+
+
+# =========================================================
+#  (Opcional) Lista de SIGLAs capacitados em aba separada
+# =========================================================
+
+def carregar_capacitados_lista() -> Optional[Set[str]]:
+    """
+    Set de SIGLAs (uppercase) da aba de capacitados, ou None.
+    Vem da mesma leitura única do workbook usada por carregar_dados.
+    """
+    if not EXCEL_PATH.exists():
+        return None
+
+    try:
+        return obter_inventario().capacitados
+    except PlanilhaInvalida:
+        return None
@@ -0,0 +1,223 @@
+from heapq import heappop, heappush
+from typing import Callable, Optional
+
+import numpy as np
+
+from utils.helpers import haversine_top_k, preparar_sitios
+
+R_TERRA_KM = 6371.0088  # mesmo raio de helpers.haversine_km
+
+
+def vetores_unitarios(lat, lon) -> np.ndarray:
+    """(lat, lon) em graus -> vetores 3D na esfera unitária, shape (n, 3)."""
+    la = np.radians(np.asarray(lat, dtype="float64"))
+    lo = np.radians(np.asarray(lon, dtype="float64"))
+    cl = np.cos(la)
+    return np.column_stack((cl * np.cos(lo), cl * np.sin(lo), np.sin(la)))
+
+
+def corda2_para_km(d2: np.ndarray) -> np.ndarray:
+    """Corda² entre vetores unitários -> distância de grande círculo (km).
+    Idêntico ao haversine: corda = 2·sin(θ/2)."""
+    return R_TERRA_KM * 2 * np.arcsin(np.minimum(1.0, np.sqrt(d2) / 2))
+
+
+class IndiceEspacial:
+    """
+    KD-tree sobre os vetores unitários das ERBs com coordenadas válidas.
+    Na esfera a distância em linha reta (corda) cresce junto com a de
+    grande círculo, então o k-vizinhos pela corda é o k-vizinhos pelo
+    haversine — e a distância exata sai da própria corda.
+    Cada nó guarda a caixa (min/max xyz) dos seus pontos; a busca é
+    best-first pelo limite inferior da caixa e para quando nenhum nó
+    restante pode melhorar os k atuais. Folhas são fatias contíguas,
+    avaliadas de uma vez com NumPy.
+    Para muitas origens de uma vez (lote) há k_nearest_lote, que usa o
+    kernel em blocos de helpers.haversine_top_k em vez da árvore.
+    """
+
+    def __init__(self, lat, lon, posicoes=None, folha: int = 32):
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        pos = np.arange(len(lat)) if posicoes is None else np.asarray(posicoes)
+        ok = np.isfinite(lat) & np.isfinite(lon)
+
+        # Lote: o kernel roda sobre coordenadas únicas (ERBs no mesmo ponto
+        # empatam exatamente); cada uma guarda suas posições em ordem crescente
+        unicos, grupo = np.unique(np.column_stack((lat[ok], lon[ok])), axis=0, return_inverse=True)
+        grupo = grupo.ravel()
+        ordem_grupo = np.argsort(grupo, kind="stable")
+        self._sitios = preparar_sitios(unicos[:, 0], unicos[:, 1])
+        self._pos_por_grupo = pos[ok][ordem_grupo]
+        self._qtd_grupo = np.bincount(grupo, minlength=len(unicos))
+        self._ini_grupo = np.cumsum(self._qtd_grupo) - self._qtd_grupo
+
+        xyz = vetores_unitarios(lat[ok], lon[ok])
+        ordem = self._construir(xyz, folha)
+        self._xyz = xyz[ordem]
+        self._pos = pos[ok][ordem]
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def _construir(self, xyz: np.ndarray, folha: int) -> np.ndarray:
+        ordem = np.arange(len(xyz))
+        ini, fim, filhos, lo, hi = [], [], [], [], []
+
+        def novo(a, b):
+            pts = xyz[ordem[a:b]]
+            ini.append(a)
+            fim.append(b)
+            filhos.append(None)
+            lo.append(pts.min(axis=0))
+            hi.append(pts.max(axis=0))
+            return len(ini) - 1
+
+        if len(xyz):
+            pilha = [novo(0, len(xyz))]
+            while pilha:
+                no = pilha.pop()
+                a, b = ini[no], fim[no]
+                if b - a <= folha:
+                    continue
+                eixo = int(np.argmax(hi[no] - lo[no]))
+                meio = (a + b) // 2
+                seg = ordem[a:b]
+                ordem[a:b] = seg[np.argpartition(xyz[seg, eixo], meio - a)]
+                filhos[no] = (novo(a, meio), novo(meio, b))
+                pilha.extend(filhos[no])
+
+        self._ini, self._fim, self._filhos = ini, fim, filhos
+        self._lo = np.array(lo).reshape(-1, 3)
+        self._hi = np.array(hi).reshape(-1, 3)
+        return ordem
+
+    def _limite_inferior(self, q: np.ndarray, no: int) -> float:
+        d = np.maximum(0.0, np.maximum(self._lo[no] - q, q - self._hi[no]))
+        return float(d @ d)
+
+    def k_nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        predicate: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        As k ERBs mais próximas de (lat, lon).
+        predicate: recebe um array de posições e devolve máscara booleana
+        (só as aceitas entram no resultado).
+        Retorna (posições no DataFrame de origem, distâncias em km), ordenados.
+        """
+        best_d2 = np.empty(0)
+        best_pos = np.empty(0, dtype=self._pos.dtype)
+        if k <= 0 or not len(self):
+            return best_pos, best_d2
+
+        q = vetores_unitarios([lat], [lon])[0]
+        heap = [(0.0, 0)]
+        while heap:
+            limite, no = heappop(heap)
+            if len(best_d2) >= k and limite > best_d2[-1]:
+                break
+
+            filhos = self._filhos[no]
+            if filhos is not None:
+                for f in filhos:
+                    heappush(heap, (self._limite_inferior(q, f), f))
+                continue
+
+            a, b = self._ini[no], self._fim[no]
+            dif = self._xyz[a:b] - q
+            d2 = np.einsum("ij,ij->i", dif, dif)
+            pos = self._pos[a:b]
+            if predicate is not None:
+                aceito = np.asarray(predicate(pos), dtype=bool)
+                d2, pos = d2[aceito], pos[aceito]
+                if not len(pos):
+                    continue
+
+            d2 = np.concatenate((best_d2, d2))
+            pos = np.concatenate((best_pos, pos))
+            ordem = np.lexsort((pos, d2))[:k]
+            best_d2, best_pos = d2[ordem], pos[ordem]
+
+        return best_pos, corda2_para_km(best_d2)
+
+    def k_nearest_lote(self, lats, lons, k: int, memoria_mb: float = 64.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        k_nearest para várias origens: (posições, distâncias em km), ambos
+        com shape (n_origens, min(k, len(self))), ordenados por linha.
+        """
+        k = min(k, len(self))
+        u, dist = haversine_top_k(lats, lons, self._sitios, k, memoria_mb=memoria_mb)
+        n = len(u)
+        if n == 0 or k == 0:
+            return np.empty((n, k), dtype=self._pos.dtype), np.empty((n, k))
+
+        # Expande cada coordenada nas suas (até k) posições e reordena por
+        # (distância, posição) — o mesmo desempate de k_nearest
+        j = np.arange(k)
+        valido = j < self._qtd_grupo[u][..., None]
+        pos = self._pos_por_grupo[self._ini_grupo[u][..., None] + np.where(valido, j, 0)]
+        dist = np.where(valido, dist[..., None], np.inf)
+        pos, dist = pos.reshape(n, -1), dist.reshape(n, -1)
+        ordem = np.lexsort((pos, dist), axis=-1)[:, :k]
+        return np.take_along_axis(pos, ordem, axis=1), np.take_along_axis(dist, ordem, axis=1)
+
+
+def selecionar_com_capacitado(
+    geral: IndiceEspacial,
+    capacitados: IndiceEspacial,
+    lat: float,
+    lon: float,
+    n_outros: int = 2,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Regra da busca por endereço numa única chamada:
+      - SEMPRE o capacitado mais próximo (índice só de capacitados),
+        mesmo que esteja longe;
+      - mais os n_outros vizinhos gerais (sem repetir o capacitado).
+    Sem capacitados, devolve os n_outros + 1 mais próximos.
+    Retorna (posições, distâncias em km, máscara "capacitado forçado").
+    """
+    pos_cap, dist_cap = capacitados.k_nearest(lat, lon, 1)
+    if not len(pos_cap):
+        pos, dist = geral.k_nearest(lat, lon, n_outros + 1)
+        return pos, dist, np.zeros(len(pos), dtype=bool)
+
+    excl = pos_cap[0]
+    pos, dist = geral.k_nearest(lat, lon, n_outros, predicate=lambda p: p != excl)
+    forcado = np.zeros(len(pos) + 1, dtype=bool)
+    forcado[0] = True
+    return np.concatenate((pos_cap, pos)), np.concatenate((dist_cap, dist)), forcado
+
+
+def selecionar_com_capacitado_lote(
+    geral: IndiceEspacial,
+    capacitados: IndiceEspacial,
+    lats,
+    lons,
+    n_outros: int = 2,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mesma regra de selecionar_com_capacitado para muitas origens.
+    Retorna (posições, distâncias, máscara "capacitado forçado"), cada um
+    com shape (n_origens, nº de ERBs por origem).
+    """
+    if not len(capacitados):
+        pos, dist = geral.k_nearest_lote(lats, lons, n_outros + 1)
+        return pos, dist, np.zeros(pos.shape, dtype=bool)
+
+    pos_cap, dist_cap = capacitados.k_nearest_lote(lats, lons, 1)
+    # +1: o capacitado escolhido pode estar entre os vizinhos gerais
+    pos, dist = geral.k_nearest_lote(lats, lons, n_outros + 1)
+    outro = pos != pos_cap
+    n_manter = min(n_outros, int(outro.sum(axis=1).min())) if len(pos) else 0
+    manter = np.argsort(~outro, axis=1, kind="stable")[:, :n_manter]
+    pos = np.take_along_axis(pos, manter, axis=1)
+    dist = np.take_along_axis(dist, manter, axis=1)
+
+    forcado = np.zeros((len(pos), n_manter + 1), dtype=bool)
+    forcado[:, 0] = True
+    return np.hstack((pos_cap, pos)), np.hstack((dist_cap, dist)), forcado
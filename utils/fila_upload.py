@@ -0,0 +1,189 @@
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from utils.banco import BancoSQLite
+from utils.fotos_db import RegistroFotos
+
+# =========================================================
+#  Fila de envio para o Supabase (outbox local + worker)
+# =========================================================
+#
+# O envio da foto grava tudo localmente (arquivos + registro) e só
+# enfileira o envio para a nuvem: o técnico não espera a rede. Um thread
+# em segundo plano pega os itens vencidos, sobe os arquivos para o bucket,
+# insere os metadados na tabela e reescreve as URLs do registro local com
+# as públicas. Falhas voltam para a fila com backoff exponencial.
+# A fila é uma tabela SQLite: sobrevive a reinícios, e o "aluguel"
+# (bloqueado_ate) impede que dois workers enviem o mesmo item.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id             INTEGER PRIMARY KEY,
+    foto_id        INTEGER NOT NULL,
+    payload        TEXT NOT NULL,
+    tentativas     INTEGER NOT NULL DEFAULT 0,
+    proxima        REAL NOT NULL,
+    bloqueado_ate  REAL NOT NULL DEFAULT 0,
+    ultimo_erro    TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_proxima ON outbox (proxima);
+"""
+
+
+# Colunas que tabelas antigas do Supabase podem não ter
+_COLUNAS_OPCIONAIS = ("thumb_url", "web_url", "sha256")
+# Erros do PostgREST/Postgres para "coluna não existe"
+_CODIGOS_COLUNA_AUSENTE = ("PGRST204", "42703")
+
+
+def _coluna_ausente(erro: Exception) -> bool:
+    """O insert falhou porque a tabela não tem alguma coluna opcional?"""
+    codigo = getattr(erro, "code", None)
+    if codigo not in _CODIGOS_COLUNA_AUSENTE:
+        return False
+    mensagem = str(getattr(erro, "message", None) or erro)
+    return any(c in mensagem for c in _COLUNAS_OPCIONAIS)
+
+
+class FilaUpload(BancoSQLite):
+    SCHEMA = _SCHEMA
+    BACKOFF_S = 10.0         # 1ª nova tentativa; dobra a cada falha
+    BACKOFF_MAX_S = 3600.0
+    ALUGUEL_S = 300.0        # item "em envio" volta para a fila se o worker morrer
+    INTERVALO_S = 5.0        # espera do worker quando não há nada vencido
+
+    def __init__(self, path: Path, registro: RegistroFotos, client, bucket: str,
+                 tabela: Optional[str] = None):
+        super().__init__(path)
+        self.registro = registro
+        self.client = client
+        self.bucket = bucket
+        self.tabela = tabela
+        self._acordar = threading.Event()
+        self._con()
+
+    # ---------- Lado da página ----------
+
+    def enfileirar(self, foto_id: int, sigla: str, arquivos: dict, metadados: dict) -> None:
+        """
+        arquivos:  {campo da URL ("photo_url", "thumb_url", ...):
+                    [caminho local, caminho no bucket, MIME]}
+        metadados: linha a inserir na tabela do Supabase (as URLs dos
+                   'arquivos' são trocadas pelas públicas antes do insert)
+        """
+        payload = {"sigla": sigla, "arquivos": arquivos, "metadados": metadados, "urls": {}}
+        self._con().execute(
+            "INSERT INTO outbox (foto_id, payload, proxima) VALUES (?, ?, ?)",
+            (foto_id, json.dumps(payload), time.time()),
+        )
+        self._acordar.set()
+
+    def pendentes(self) -> int:
+        return self._con().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def pendente(self, foto_id: int) -> bool:
+        return self._con().execute(
+            "SELECT 1 FROM outbox WHERE foto_id = ?", (foto_id,)
+        ).fetchone() is not None
+
+    # ---------- Worker ----------
+
+    def iniciar(self) -> "FilaUpload":
+        threading.Thread(target=self._vigiar, name="fila-upload", daemon=True).start()
+        return self
+
+    def _vigiar(self):
+        while True:
+            try:
+                trabalhou = self.processar_vencidos()
+            except Exception:
+                trabalhou = False  # SQLite ocupado etc.: tenta no próximo ciclo
+            if not trabalhou:
+                self._acordar.wait(self.INTERVALO_S)
+                self._acordar.clear()
+
+    def processar_vencidos(self, limite: int = 10) -> bool:
+        """Processa até 'limite' itens vencidos. Retorna se havia algum."""
+        agora = time.time()
+        ids = [r[0] for r in self._con().execute(
+            "SELECT id FROM outbox WHERE proxima <= ? AND bloqueado_ate <= ? ORDER BY proxima LIMIT ?",
+            (agora, agora, limite),
+        )]
+        for item_id in ids:
+            payload = self._alugar(item_id)
+            if payload is not None:
+                self._processar(item_id, payload)
+        return bool(ids)
+
+    def _alugar(self, item_id: int) -> Optional[dict]:
+        agora = time.time()
+        cur = self._con().execute(
+            "UPDATE outbox SET bloqueado_ate = ? WHERE id = ? AND bloqueado_ate <= ?",
+            (agora + self.ALUGUEL_S, item_id, agora),
+        )
+        if cur.rowcount != 1:
+            return None  # outro worker pegou
+        row = self._con().execute("SELECT foto_id, payload FROM outbox WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            return None
+        payload = json.loads(row[1])
+        payload["foto_id"] = row[0]
+        return payload
+
+    def _processar(self, item_id: int, payload: dict) -> None:
+        try:
+            # Arquivos já enviados numa tentativa anterior ficam em 'urls'
+            for campo, (local, remoto, mime) in payload["arquivos"].items():
+                if campo in payload["urls"]:
+                    continue
+                payload["urls"][campo] = self._enviar_arquivo(local, remoto, mime)
+                self._salvar_progresso(item_id, payload)
+
+            if self.tabela and not payload.get("inserido"):
+                linha = dict(payload["metadados"], **payload["urls"])
+                self._inserir_metadados(linha)
+                payload["inserido"] = True
+                self._salvar_progresso(item_id, payload)
+
+            self.registro.atualizar_urls(payload["foto_id"], payload["urls"])
+            self._con().execute("DELETE FROM outbox WHERE id = ?", (item_id,))
+        except Exception as e:
+            self._reagendar(item_id, e)
+
+    def _enviar_arquivo(self, local: str, remoto: str, mime: str) -> str:
+        storage = self.client.storage.from_(self.bucket)
+        # Arquivo aberto (não bytes): o cliente envia em streaming.
+        # upsert: reenvio após falha parcial não dá conflito
+        with open(local, "rb") as f:
+            storage.upload(file=f, path=remoto, file_options={"content-type": mime, "upsert": "true"})
+        return storage.get_public_url(remoto)
+
+    def _inserir_metadados(self, linha: dict) -> None:
+        try:
+            self.client.table(self.tabela).insert(linha).execute()
+        except Exception as e:
+            # Tabelas criadas antes das colunas opcionais: grava sem elas.
+            # Qualquer outro erro (rede, RLS, timeout) volta para a fila e a
+            # próxima tentativa envia a linha completa.
+            if not _coluna_ausente(e) or not any(c in linha for c in _COLUNAS_OPCIONAIS):
+                raise
+            base = {k: v for k, v in linha.items() if k not in _COLUNAS_OPCIONAIS}
+            self.client.table(self.tabela).insert(base).execute()
+
+    def _salvar_progresso(self, item_id: int, payload: dict) -> None:
+        dados = {k: v for k, v in payload.items() if k != "foto_id"}
+        self._con().execute("UPDATE outbox SET payload = ? WHERE id = ?", (json.dumps(dados), item_id))
+
+    def _reagendar(self, item_id: int, erro: Exception) -> None:
+        row = self._con().execute("SELECT tentativas FROM outbox WHERE id = ?", (item_id,)).fetchone()
+        tentativas = (row[0] if row else 0) + 1
+        espera = min(self.BACKOFF_MAX_S, self.BACKOFF_S * 2 ** (tentativas - 1))
+        espera *= random.uniform(0.8, 1.2)  # espalha as tentativas de vários itens
+        self._con().execute(
+            "UPDATE outbox SET tentativas = ?, proxima = ?, bloqueado_ate = 0, ultimo_erro = ? WHERE id = ?",
+            (tentativas, time.time() + espera, str(erro)[:500], item_id),
+        )
@@ -0,0 +1,142 @@
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from utils.banco import BancoSQLite
+
+# =========================================================
+#  Metadados das fotos de cadeados (SQLite)
+# =========================================================
+#
+# Substitui o data/locks.csv (append + leitura completa a cada rerun).
+# Modo WAL: leitores não bloqueiam a gravação e vários workers podem
+# inserir ao mesmo tempo. O índice (sigla, timestamp) resolve "últimas N
+# da SIGLA" sem varrer a tabela.
+
+COLUNAS = (
+    "timestamp", "sigla", "lock_type", "notes", "photo_url", "uploaded_by",
+    "thumb_url", "web_url", "sha256",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fotos (
+    id          INTEGER PRIMARY KEY,
+    timestamp   TEXT NOT NULL,
+    sigla       TEXT NOT NULL,
+    lock_type   TEXT,
+    notes       TEXT,
+    photo_url   TEXT,
+    uploaded_by TEXT,
+    thumb_url   TEXT,
+    web_url     TEXT,
+    sha256      TEXT
+);
+CREATE INDEX IF NOT EXISTS fotos_sigla_timestamp ON fotos (sigla, timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+class RegistroFotos(BancoSQLite):
+    SCHEMA = _SCHEMA
+    ROW_FACTORY = sqlite3.Row
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._con()
+
+    def _migrar(self, con: sqlite3.Connection) -> None:
+        # Bancos criados antes das colunas novas
+        existentes = {r[1] for r in con.execute("PRAGMA table_info(fotos)")}
+        for c in COLUNAS:
+            if c not in existentes:
+                con.execute(f"ALTER TABLE fotos ADD COLUMN {c} TEXT")
+        con.execute("CREATE INDEX IF NOT EXISTS fotos_sigla_sha256 ON fotos (sigla, sha256)")
+
+    def inserir(self, row: dict) -> int:
+        """Grava uma foto (colunas de COLUNAS; sigla em uppercase). Retorna o id."""
+        valores = {c: row.get(c) for c in COLUNAS}
+        valores["sigla"] = str(valores["sigla"]).strip().upper()
+        cur = self._con().execute(
+            f"INSERT INTO fotos ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})",
+            tuple(valores[c] for c in COLUNAS),
+        )
+        return int(cur.lastrowid)
+
+    def atualizar_urls(self, foto_id: int, urls: dict) -> None:
+        """Troca photo_url/thumb_url/web_url (ex.: caminho local -> URL pública)."""
+        urls = {c: v for c, v in urls.items() if c in ("photo_url", "thumb_url", "web_url")}
+        if not urls:
+            return
+        self._con().execute(
+            f"UPDATE fotos SET {', '.join(f'{c} = ?' for c in urls)} WHERE id = ?",
+            (*urls.values(), foto_id),
+        )
+
+    def por_hash(self, sigla: str, sha256: str) -> Optional[dict]:
+        """Foto já registrada para a SIGLA com o mesmo conteúdo, ou None."""
+        row = self._con().execute(
+            f"SELECT id, {', '.join(COLUNAS)} FROM fotos WHERE sigla = ? AND sha256 = ? LIMIT 1",
+            (str(sigla).strip().upper(), sha256),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def ultimas(self, sigla: str, limite: int = 12) -> list[dict]:
+        """As 'limite' fotos mais recentes da SIGLA (busca pelo índice)."""
+        rows = self._con().execute(
+            f"SELECT id, {', '.join(COLUNAS)} FROM fotos "
+            "WHERE sigla = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (str(sigla).strip().upper(), limite),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def migrar_csv(self, csv_path: Path) -> Optional[int]:
+        """
+        Importa o locks.csv antigo uma única vez (marcado na tabela meta,
+        tudo numa transação). Depois renomeia o CSV para '.migrado'.
+        Retorna o nº de linhas importadas, ou None se não havia o que migrar.
+        """
+        csv_path = Path(csv_path)
+        con = self._con()
+        if not csv_path.exists():
+            return None
+        if con.execute("SELECT 1 FROM meta WHERE chave = 'migracao_csv'").fetchone():
+            return None
+
+        df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8")
+        for c in COLUNAS:
+            if c not in df.columns:
+                df[c] = ""
+        df = df[df["sigla"].str.strip() != ""]
+        linhas = [
+            (r[0], r[1].strip().upper(), *r[2:])
+            for r in df[list(COLUNAS)].itertuples(index=False, name=None)
+        ]
+
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            # Outro worker pode ter migrado enquanto este lia o CSV
+            if con.execute("SELECT 1 FROM meta WHERE chave = 'migracao_csv'").fetchone():
+                con.execute("ROLLBACK")
+                return None
+            con.executemany(
+                f"INSERT INTO fotos ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})",
+                linhas,
+            )
+            con.execute(
+                "INSERT INTO meta (chave, valor) VALUES ('migracao_csv', ?)", (str(len(linhas)),)
+            )
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            con.execute("ROLLBACK")
+            raise
+
+        try:
+            csv_path.replace(csv_path.with_name(csv_path.name + ".migrado"))
+        except OSError:
+            pass  # já marcado como migrado: o CSV não é relido
+        return len(linhas)
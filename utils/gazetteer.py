@@ -0,0 +1,266 @@
+import sys
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import haversine_km, normalizar_endereco
+
+# =========================================================
+#  Geocodificador local (gazetteer) do RJ
+# =========================================================
+#
+# Índice compacto em memória, montado junto com o inventário:
+#   - endereços das próprias ERBs (enderecos.xlsx)
+#   - extrato importado de OSM/CEP (data/gazetteer.csv.gz, opcional)
+# Resolve sem rede: endereço exato, CEP (centróide), logradouro + número
+# próximo e bairro (centróide). Qualquer dúvida vira miss e o
+# geocode_address segue para os provedores remotos.
+
+GAZETTEER_PATH = Path("data/gazetteer.csv.gz")
+
+# Número mais distante aceito numa rua conhecida (casas ~10-20 m cada)
+TOLERANCIA_NUMERO = 100
+# Pontos da mesma rua mais espalhados que isso = nome ambíguo (outra cidade)
+ESPALHAMENTO_MAX_KM = 3.0
+
+# Municípios do RJ: reconhecem a cidade citada na consulta e a cidade das
+# ERBs (prefixo do nome na planilha). Normalizados com normalizar_endereco.
+MUNICIPIOS_RJ = frozenset(normalizar_endereco(m) for m in (
+    "Angra dos Reis", "Aperibé", "Araruama", "Areal", "Armação dos Búzios",
+    "Arraial do Cabo", "Barra do Piraí", "Barra Mansa", "Belford Roxo",
+    "Bom Jardim", "Bom Jesus do Itabapoana", "Cabo Frio", "Cachoeiras de Macacu",
+    "Cambuci", "Campos dos Goytacazes", "Cantagalo", "Carapebus", "Cardoso Moreira",
+    "Carmo", "Casimiro de Abreu", "Comendador Levy Gasparian", "Conceição de Macabu",
+    "Cordeiro", "Duas Barras", "Duque de Caxias", "Engenheiro Paulo de Frontin",
+    "Guapimirim", "Iguaba Grande", "Itaboraí", "Itaguaí", "Italva", "Itaocara",
+    "Itaperuna", "Itatiaia", "Japeri", "Laje do Muriaé", "Macaé", "Macuco", "Magé",
+    "Mangaratiba", "Maricá", "Mendes", "Mesquita", "Miguel Pereira", "Miracema",
+    "Natividade", "Nilópolis", "Niterói", "Nova Friburgo", "Nova Iguaçu",
+    "Paracambi", "Paraíba do Sul", "Paraty", "Paty do Alferes", "Petrópolis",
+    "Pinheiral", "Piraí", "Porciúncula", "Porto Real", "Quatis", "Queimados",
+    "Quissamã", "Resende", "Rio Bonito", "Rio Claro", "Rio das Flores",
+    "Rio das Ostras", "Rio de Janeiro", "Santa Maria Madalena",
+    "Santo Antônio de Pádua", "São Fidélis", "São Francisco de Itabapoana",
+    "São Gonçalo", "São João da Barra", "São João de Meriti", "São José de Ubá",
+    "São José do Vale do Rio Preto", "São Pedro da Aldeia", "São Sebastião do Alto",
+    "Sapucaia", "Saquarema", "Seropédica", "Silva Jardim", "Sumidouro", "Tanguá",
+    "Teresópolis", "Trajano de Moraes", "Três Rios", "Valença", "Varre-Sai",
+    "Vassouras", "Volta Redonda",
+))
+
+_TIPOS_LOGRADOURO = {
+    "rua", "avenida", "estrada", "travessa", "praca", "alameda", "rodovia",
+    "largo", "ladeira", "vila", "beco", "caminho", "servidao",
+}
+
+
+def _decompor(chave: str):
+    """chave canônica -> (logradouro, número ou None, demais tokens, CEP ou None)."""
+    texto, _, cep = chave.partition("|")
+    tokens = texto.split()
+    for i, t in enumerate(tokens):
+        if not t.isdigit() or i == 0:
+            continue
+        if tokens[i - 1] in _TIPOS_LOGRADOURO:  # "rua 2", "avenida 7 ..."
+            continue
+        if i + 1 < len(tokens) and tokens[i + 1] == "de":  # "7 de setembro"
+            continue
+        return " ".join(tokens[:i]), int(t), tokens[i + 1:], cep or None
+    return texto, None, [], cep or None
+
+
+class Gazetteer:
+    def __init__(self):
+        self._exatos: dict[str, list] = {}
+        self._ceps: dict[str, list] = {}
+        self._bairros: dict[str, list] = {}
+        self._ruas: dict[str, list] = {}
+        self._centroides_cep: dict[str, tuple] = {}
+        self._centroides_bairro: dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._exatos)
+
+    def adicionar(self, endereco: str, lat: float, lon: float, cidade: str = "",
+                  bairro: str = "", cep: str = "", rotulo: Optional[str] = None):
+        chave = normalizar_endereco(endereco)
+        if not chave or not (np.isfinite(lat) and np.isfinite(lon)):
+            return
+        rua, numero, _, cep_texto = _decompor(chave)
+        cep = "".join(ch for ch in str(cep or cep_texto or "") if ch.isdigit())
+        cidade = normalizar_endereco(cidade)
+        cidade_mun = cidade if cidade in MUNICIPIOS_RJ else ""  # "" = cidade desconhecida
+        rotulo = rotulo or endereco
+        ponto = (float(lat), float(lon), rotulo)
+
+        if numero is not None:  # "rua a s n" não identifica um lugar
+            self._exatos.setdefault(chave.partition("|")[0], []).append((*ponto, cidade_mun))
+        if len(cep) == 8:
+            self._ceps.setdefault(cep, []).append(ponto)
+        if bairro:
+            b = normalizar_endereco(bairro)
+            self._bairros.setdefault(b, []).append(ponto)
+            if cidade:
+                self._bairros.setdefault(f"{b} {cidade}", []).append(ponto)
+        if rua and numero is not None:
+            self._ruas.setdefault(rua, []).append((numero, cidade_mun, ponto))
+
+    def finalizar(self) -> "Gazetteer":
+        """
+        Calcula centróides de CEP/bairro e descarta as listas brutas.
+        Grupos espalhados demais (mesma rua e número em cidades diferentes,
+        CEP/bairro com pontos distantes) são removidos: ambíguos demais para
+        responder. CEP genérico de cidade (xxxxx-000) nunca vira centróide.
+        """
+        self._exatos = {
+            k: v[0] for k, v in self._exatos.items()
+            if len(v) == 1 or _espalhamento_km(v) <= ESPALHAMENTO_MAX_KM
+        }  # (lat, lon, rótulo, município ou "")
+        self._centroides_cep = {
+            k: _centroide(v, f"CEP {k[:5]}-{k[5:]}") for k, v in self._ceps.items()
+            if not k.endswith("000") and _espalhamento_km(v) <= ESPALHAMENTO_MAX_KM
+        }
+        self._centroides_bairro = {
+            k: _centroide(v, k.title()) for k, v in self._bairros.items()
+            if _espalhamento_km(v) <= ESPALHAMENTO_MAX_KM
+        }
+        self._ceps, self._bairros = {}, {}
+        return self
+
+    def buscar(self, endereco: str) -> Optional[tuple]:
+        """(lat, lon, rótulo) ou None quando a base local não tem certeza."""
+        chave = normalizar_endereco(endereco)
+        if not chave:
+            return None
+        texto = chave.partition("|")[0]
+
+        cidades = _municipios_em(texto)
+        if texto in self._exatos:
+            lat, lon, rotulo, cidade = self._exatos[texto]
+            # Endereço igual, mas a consulta cita outro município: não confia
+            if not (cidade and cidades and cidade not in cidades):
+                return lat, lon, f"{rotulo} (base local)"
+
+        rua, numero, resto, cep = _decompor(chave)
+        if cep and cep in self._centroides_cep:
+            return self._centroides_cep[cep]
+
+        if numero is not None and rua in self._ruas:
+            achado = self._por_numero(self._ruas[rua], numero, _municipios_em(" ".join(resto)))
+            if achado:
+                return achado
+
+        if texto in self._centroides_bairro:
+            return self._centroides_bairro[texto]
+        return None
+
+    def _por_numero(self, entradas: list, numero: int, cidades: set) -> Optional[tuple]:
+        """
+        'cidades': municípios citados na consulta. Com cidade na consulta,
+        só pontos desse município respondem (nunca a mesma rua em outra
+        cidade, nem um ponto de cidade desconhecida); sem cidade, só pontos
+        de cidade desconhecida — os demais ficam para o provedor remoto.
+        """
+        perto = [e for e in entradas if abs(e[0] - numero) <= TOLERANCIA_NUMERO]
+        if cidades:
+            perto = [e for e in perto if e[1] in cidades]
+        else:
+            perto = [e for e in perto if not e[1]]
+        if not perto:
+            return None
+
+        if _espalhamento_km([e[2] for e in perto]) > ESPALHAMENTO_MAX_KM:
+            return None  # mesma rua em lugares diferentes: deixa para o provedor
+
+        num, _, (lat, lon, rotulo) = min(perto, key=lambda e: abs(e[0] - numero))
+        return lat, lon, f"≈ {rotulo} (base local, nº {num})"
+
+
+def _municipios_em(texto: str) -> set[str]:
+    """Municípios do RJ citados em 'texto' (já normalizado), como frase inteira."""
+    texto = f" {texto} "
+    return {m for m in MUNICIPIOS_RJ if f" {m} " in texto}
+
+
+def _espalhamento_km(pontos: list) -> float:
+    """Maior distância (km) de um ponto até a mediana do grupo."""
+    lats = np.array([p[0] for p in pontos])
+    lons = np.array([p[1] for p in pontos])
+    return float(haversine_km(np.median(lats), np.median(lons), lats, lons).max())
+
+
+def _centroide(pontos: list, rotulo: str) -> tuple:
+    return (
+        float(np.mean([p[0] for p in pontos])),
+        float(np.mean([p[1] for p in pontos])),
+        f"{rotulo} (base local, aproximado)",
+    )
+
+
+def _cidade_do_nome(nome) -> str:
+    """'NITEROI - ESTRADA VELHA DE MARICA' -> 'NITEROI' (padrão da planilha)."""
+    if not isinstance(nome, str) or " - " not in nome:
+        return ""
+    return nome.split(" - ", 1)[0]
+
+
+def construir_gazetteer(enderecos: pd.DataFrame, extrato: Path = GAZETTEER_PATH) -> Gazetteer:
+    """Semeia com os endereços das ERBs + extrato importado (se existir)."""
+    g = Gazetteer()
+    base = enderecos.dropna(subset=["endereco", "lat", "lon"])
+    for end, nome, lat, lon in zip(base["endereco"], base["nome"], base["lat"], base["lon"]):
+        g.adicionar(str(end), lat, lon, cidade=_cidade_do_nome(nome))
+
+    if extrato.exists():
+        try:
+            ext = pd.read_csv(extrato, dtype=str, keep_default_na=False)
+        except Exception:
+            ext = None
+        if ext is not None:
+            lat = pd.to_numeric(ext["lat"], errors="coerce")
+            lon = pd.to_numeric(ext["lon"], errors="coerce")
+            for r, la, lo in zip(ext.itertuples(index=False), lat, lon):
+                g.adicionar(
+                    f"{r.logradouro} {r.numero}".strip(), la, lo,
+                    cidade=r.cidade, bairro=r.bairro, cep=r.cep,
+                    rotulo=", ".join(x for x in (f"{r.logradouro} {r.numero}".strip(), r.bairro, r.cidade) if x),
+                )
+    return g.finalizar()
+
+
+# =========================================================
+#  Importação de extrato OSM/CEP
+# =========================================================
+
+COLUNAS_EXTRATO = ["logradouro", "numero", "bairro", "cidade", "cep", "lat", "lon"]
+
+
+def importar_extrato(origem: Path, destino: Path = GAZETTEER_PATH) -> int:
+    """
+    Converte um CSV de OSM/CEP (colunas: logradouro, numero, bairro,
+    cidade, cep, lat, lon — numero/bairro/cidade/cep podem faltar) no
+    extrato compacto lido por construir_gazetteer. Retorna nº de linhas.
+    """
+    df = pd.read_csv(origem, dtype=str, keep_default_na=False)
+    df.columns = df.columns.str.strip().str.lower()
+    for col in COLUNAS_EXTRATO:
+        if col not in df.columns:
+            if col in ("logradouro", "lat", "lon"):
+                raise ValueError(f"coluna obrigatória ausente no extrato: {col}")
+            df[col] = ""
+    df = df[COLUNAS_EXTRATO]
+    df = df[pd.to_numeric(df["lat"], errors="coerce").notna() & pd.to_numeric(df["lon"], errors="coerce").notna()]
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(destino, index=False, compression="gzip")
+    return len(df)
+
+
+if __name__ == "__main__":
+    # python -m utils.gazetteer extrato_osm_cep.csv
+    if len(sys.argv) != 2:
+        sys.exit("uso: python -m utils.gazetteer <extrato.csv>")
+    n = importar_extrato(Path(sys.argv[1]))
+    print(f"{n} linhas importadas em {GAZETTEER_PATH}")
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+from typing import Optional
+
+from utils.banco import CacheSQLite
+
+# =========================================================
+#  Cache persistente de geocodificação (SQLite)
+# =========================================================
+#
+# Compartilhado entre workers e reinícios (um arquivo só, modo WAL; ver
+# utils.banco). Guarda também respostas negativas (endereço não
+# encontrado) com TTL menor, e remove as entradas menos usadas quando
+# passa de max_itens.
+
+AUSENTE = object()  # sentinela: "não está no cache" (None = negativo cacheado)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    chave    TEXT PRIMARY KEY,
+    lat      REAL,
+    lon      REAL,
+    rotulo   TEXT,
+    criado   REAL NOT NULL,
+    acessado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS geocode_acessado ON geocode (acessado);
+"""
+
+
+class CacheGeocode(CacheSQLite):
+    SCHEMA = _SCHEMA
+    TABELA = "geocode"
+    COLUNAS_CHAVE = ("chave",)
+
+    def obter(self, chave: str):
+        """(lat, lon, rotulo), None (negativo cacheado) ou AUSENTE."""
+        try:
+            row = self._con().execute(
+                "SELECT lat, lon, rotulo, criado, acessado FROM geocode WHERE chave = ?",
+                (chave,),
+            ).fetchone()
+        except sqlite3.Error:
+            return AUSENTE
+        if row is None:
+            return AUSENTE
+
+        lat, lon, rotulo, criado, acessado = row
+        agora = time.time()
+        if not self._valido(criado, lat is None, agora):
+            return AUSENTE
+        self._tocar([acessado], [(chave,)], agora)
+        return None if lat is None else (lat, lon, rotulo)
+
+    def salvar(self, chave: str, valor: Optional[tuple]) -> None:
+        agora = time.time()
+        lat, lon, rotulo = valor if valor else (None, None, None)
+        try:
+            self._con().execute(
+                "INSERT OR REPLACE INTO geocode (chave, lat, lon, rotulo, criado, acessado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, lat, lon, rotulo, agora, agora),
+            )
+        except sqlite3.Error:
+            return
+        self._gravou()
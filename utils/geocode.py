@@ -1,30 +1,313 @@
+import csv
+import sys
+import threading
 import time
 import requests
 import streamlit as st
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from utils.config import obter_config
+from utils.geocache import AUSENTE, CacheGeocode
+from utils.data_loader import obter_inventario
+from utils.helpers import normalizar_endereco
+from utils.http_client import cliente
+from utils.limitador import limitador
+
+GEOAPIFY_KEY = (obter_config("GEOAPIFY_KEY", "") or "").strip()
+
+GEOCODE_CACHE_PATH = Path(obter_config("GEOCODE_CACHE_PATH", "data/geocode_cache.sqlite"))
+GEOCODE_CACHE_TTL_DIAS = float(obter_config("GEOCODE_CACHE_TTL_DIAS", 90))
+GEOCODE_CACHE_TTL_NEGATIVO_H = float(obter_config("GEOCODE_CACHE_TTL_NEGATIVO_H", 24))
+GEOCODE_CACHE_MAX = int(obter_config("GEOCODE_CACHE_MAX", 50000))
+# Base local (ERBs + extrato OSM/CEP importado) antes dos provedores remotos
+GEOCODER_LOCAL = str(obter_config("GEOCODER_LOCAL", "1")).strip().lower() not in ("0", "false", "nao", "não")
+
+# Limites de uso dos provedores (compartilhados entre sessões e processos)
+NOMINATIM_REQ_POR_S = float(obter_config("NOMINATIM_REQ_POR_S", 1.0))
+GEOAPIFY_REQ_POR_S = float(obter_config("GEOAPIFY_REQ_POR_S", 5.0))
+ESPERA_MAX_LIMITE_S = 15.0
+
+# Requisição "hedged": se o Geoapify não respondeu em GEOCODE_HEDGE_S
+# segundos, dispara o Nominatim em paralelo e fica com a primeira resposta
+# válida. 0 = os dois ao mesmo tempo; negativo = sequencial (sem corrida).
+GEOCODE_HEDGE_S = float(obter_config("GEOCODE_HEDGE_S", 0.8))
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="geocode")
+
+# Lote (geocode_many): buscas remotas simultâneas e uso do endpoint batch
+GEOCODE_CONCORRENCIA = int(obter_config("GEOCODE_CONCORRENCIA", 4))
+GEOAPIFY_LOTE_MIN = 20      # abaixo disso, requisições individuais saem antes
+GEOAPIFY_LOTE_MAX = 1000    # limite de endereços por job do Geoapify
+GEOAPIFY_LOTE_ESPERA_S = 120.0
+
+
+@st.cache_resource(show_spinner=False)
+def _cache() -> CacheGeocode:
+    return CacheGeocode(
+        GEOCODE_CACHE_PATH,
+        ttl_s=GEOCODE_CACHE_TTL_DIAS * 86400,
+        ttl_negativo_s=GEOCODE_CACHE_TTL_NEGATIVO_H * 3600,
+        max_itens=GEOCODE_CACHE_MAX,
+    )
 
-GEOAPIFY_KEY = (st.secrets.get("GEOAPIFY_KEY", "") or "").strip()
 
-@st.cache_data
 def geocode_address(addr: str):
-    if GEOAPIFY_KEY:
-        r = requests.get(
-            "https://api.geoapify.com/v1/geocode/search",
-            params={"text": addr, "apiKey": GEOAPIFY_KEY, "limit": 1}
-        )
-        j = r.json()
-        if j.get("features"):
-            p = j["features"][0]["properties"]
-            return p["lat"], p["lon"], p.get("formatted")
+    """
+    (lat, lon, endereço formatado) ou None.
+    Consulta primeiro o cache persistente (SQLite, compartilhado entre
+    workers e reinícios), com a chave = normalizar_endereco(addr), então
+    variações triviais de grafia compartilham a mesma entrada. Depois tenta
+    a base local (gazetteer do inventário, sem rede); só vai aos
+    provedores remotos quando as duas falham.
+    Falhas de rede NÃO são cacheadas; "não encontrado" é (TTL menor).
+    """
+    chave = normalizar_endereco(addr)
+    hit = _cache().obter(chave)
+    if hit is not AUSENTE:
+        return hit
 
-    # Fallback — Nominatim
-    time.sleep(1)
-    r = requests.get(
+    local = _geocode_local(addr)
+    if local:
+        return local
+
+    try:
+        res = _geocode_remoto(addr)
+    except requests.RequestException:
+        return None  # provedores fora do ar/lentos: não cacheia
+    _cache().salvar(chave, res)
+    return res
+
+
+def _geocode_local(addr: str):
+    if not GEOCODER_LOCAL:
+        return None
+    try:
+        return obter_inventario().gazetteer.buscar(addr)
+    except Exception:
+        return None  # inventário indisponível: segue para os provedores
+
+
+def _aguardar_vez(provedor: str, taxa_por_s: float, cancelar=None):
+    if not limitador(provedor, taxa_por_s).adquirir(timeout=ESPERA_MAX_LIMITE_S, cancelar=cancelar):
+        raise requests.RequestException(f"{provedor}: sem vez no limite de uso (ou cancelado)")
+
+
+def _vez(provedor: str, taxa_por_s: float, cancelar=None):
+    """Para o 'vez' do cliente HTTP: cada tentativa (inclusive retry) gasta um token."""
+    return lambda: _aguardar_vez(provedor, taxa_por_s, cancelar)
+
+
+def _geoapify(addr: str):
+    r = cliente("geoapify").get(
+        "https://api.geoapify.com/v1/geocode/search",
+        params={"text": addr, "apiKey": GEOAPIFY_KEY, "limit": 1},
+        vez=_vez("geoapify", GEOAPIFY_REQ_POR_S),
+    )
+    r.raise_for_status()
+    j = r.json()
+    if j.get("features"):
+        p = j["features"][0]["properties"]
+        return p["lat"], p["lon"], p.get("formatted")
+    return None
+
+
+def _nominatim(addr: str, cancelar=None):
+    # Política do Nominatim: no máximo 1 req/s (somando todos os usuários)
+    r = cliente("nominatim", headers={"User-Agent": "site-app"}).get(
         "https://nominatim.openstreetmap.org/search",
         params={"q": addr, "format": "json", "limit": 1, "countrycodes": "br"},
-        headers={"User-Agent": "site-app"}
+        vez=_vez("nominatim", NOMINATIM_REQ_POR_S, cancelar),
     )
+    r.raise_for_status()
     j = r.json()
     if j:
         return float(j[0]["lat"]), float(j[0]["lon"]), j[0]["display_name"]
+    return None
+
+
+def _geocode_remoto(addr: str):
+    """
+    Geoapify (se houver chave) e, sem resposta, Nominatim.
+    Levanta RequestException se o último provedor não respondeu — nesse
+    caso o "não encontrado" não é definitivo e não deve ir para o cache.
+    """
+    if GEOAPIFY_KEY and GEOCODE_HEDGE_S >= 0:
+        return _geocode_corrida(addr)
+
+    if GEOAPIFY_KEY:
+        try:
+            res = _geoapify(addr)
+            if res:
+                return res
+        except (requests.RequestException, ValueError):
+            pass  # segue para o fallback
+
+    # Fallback — Nominatim
+    try:
+        return _nominatim(addr)
+    except ValueError as e:  # JSON inválido
+        raise requests.RequestException(str(e)) from e
+
+
+def _geocode_corrida(addr: str):
+    """
+    Mesmo contrato de _geocode_remoto, com os provedores em corrida:
+    Geoapify sai na frente; o Nominatim entra após GEOCODE_HEDGE_S (ou
+    assim que o Geoapify falhar/não achar). A primeira resposta válida
+    vence; a outra é cancelada (se ainda esperava a vez no limitador,
+    nem chega a gastar a cota) ou tem o resultado descartado.
+    """
+    cancelar = threading.Event()
+    primario = _pool.submit(_geoapify, addr)
+    secundario = None
+    try:
+        wait([primario], timeout=GEOCODE_HEDGE_S)
+        if primario.done() and _valor(primario):
+            return _valor(primario)
+
+        secundario = _pool.submit(_nominatim, addr, cancelar)
+        pendentes = {primario, secundario}
+        while pendentes:
+            feitos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for f in feitos:
+                if _valor(f):
+                    return _valor(f)
+    finally:
+        cancelar.set()
+        for f in (primario, secundario):
+            if f is not None:
+                f.cancel()
+
+    # Ninguém achou: só é "não encontrado" definitivo se o Nominatim respondeu
+    erro = secundario.exception()
+    if erro is not None:
+        raise requests.RequestException(str(erro)) from erro
+    return None
+
+
+def _valor(futuro):
+    """Resultado de um provedor já concluído (None se falhou ou não achou)."""
+    if futuro.exception() is not None:
+        return None
+    return futuro.result()
+
+
+# =========================================================
+#  Geocodificação em lote
+# =========================================================
+
+def geocode_many(addresses: Iterable[str]) -> Iterator[tuple[str, object]]:
+    """
+    Geocodifica uma lista de endereços, devolvendo (endereço, resultado)
+    à medida que cada um fica pronto (resultado no formato de
+    geocode_address). Entradas repetidas — inclusive com grafias que
+    normalizam para a mesma chave — são buscadas uma vez só.
+    Ordem: hits do cache e da base local primeiro; depois o endpoint batch
+    do Geoapify (se houver chave e volume); o resto vai em paralelo, até
+    GEOCODE_CONCORRENCIA por vez, sempre dentro dos limitadores de taxa.
+    """
+    por_chave: dict[str, list[str]] = {}
+    for addr in dict.fromkeys(a for a in addresses if isinstance(a, str) and a.strip()):
+        por_chave.setdefault(normalizar_endereco(addr), []).append(addr)
+
+    faltando: dict[str, str] = {}  # chave -> texto enviado aos provedores
+    for chave, originais in por_chave.items():
+        hit = _cache().obter(chave)
+        if hit is AUSENTE:
+            hit = _geocode_local(originais[0]) or AUSENTE
+        if hit is AUSENTE:
+            faltando[chave] = originais[0]
+            continue
+        for addr in originais:
+            yield addr, hit
+
+    so_nominatim: set[str] = set()
+    if GEOAPIFY_KEY and len(faltando) >= GEOAPIFY_LOTE_MIN:
+        for chave, res in _geoapify_lote(faltando):
+            if res:
+                _cache().salvar(chave, res)
+                for addr in por_chave[chave]:
+                    yield addr, res
+                del faltando[chave]
+            else:
+                so_nominatim.add(chave)  # Geoapify já respondeu "não achei"
+
+    def _buscar(chave: str):
+        addr = faltando[chave]
+        if chave in so_nominatim:
+            return _nominatim(addr)
+        return _geocode_remoto(addr)
+
+    with ThreadPoolExecutor(max_workers=GEOCODE_CONCORRENCIA, thread_name_prefix="geocode-lote") as ex:
+        futuros = {ex.submit(_buscar, chave): chave for chave in faltando}
+        for f in as_completed(futuros):
+            chave = futuros[f]
+            try:
+                res = f.result()
+            except (requests.RequestException, ValueError):
+                res = None  # falha transitória: não cacheia
+            else:
+                _cache().salvar(chave, res)
+            for addr in por_chave[chave]:
+                yield addr, res
+
+
+def _geoapify_lote(faltando: dict[str, str]) -> Iterator[tuple[str, object]]:
+    """
+    Endpoint batch do Geoapify (job assíncrono: POST cria, GET consulta).
+    Devolve (chave, resultado ou None) só para o que o job respondeu;
+    se o job falhar, simplesmente não devolve nada (vai tudo para o
+    caminho individual).
+    """
+    itens = list(faltando.items())
+    url = "https://api.geoapify.com/v1/batch/geocode/search"
+    for ini in range(0, len(itens), GEOAPIFY_LOTE_MAX):
+        lote = itens[ini:ini + GEOAPIFY_LOTE_MAX]
+        try:
+            r = cliente("geoapify").post(
+                url, params={"apiKey": GEOAPIFY_KEY}, json=[addr for _, addr in lote],
+                vez=_vez("geoapify", GEOAPIFY_REQ_POR_S),
+            )
+            r.raise_for_status()
+            job = r.json()
+            resultados = _aguardar_job(job.get("url") or f"{url}?id={job['id']}&apiKey={GEOAPIFY_KEY}")
+        except (requests.RequestException, ValueError, KeyError):
+            continue
+        if resultados is None or len(resultados) != len(lote):
+            continue
+        for (chave, _), item in zip(lote, resultados):
+            if item.get("lat") is not None and item.get("lon") is not None:
+                yield chave, (item["lat"], item["lon"], item.get("formatted"))
+            else:
+                yield chave, None
+
+
+def _aguardar_job(url: str):
+    limite = time.monotonic() + GEOAPIFY_LOTE_ESPERA_S
+    espera = 1.0
+    while time.monotonic() < limite:
+        time.sleep(espera)
+        r = cliente("geoapify").get(url, vez=_vez("geoapify", GEOAPIFY_REQ_POR_S))
+        if r.status_code == 200:
+            return r.json()
+        if r.status_code != 202:  # 202 = job ainda processando
+            r.raise_for_status()
+            return None
+        espera = min(espera * 1.5, 5.0)
+    return None
+
 
-    return None
\ No newline at end of file
+if __name__ == "__main__":
+    # python -m utils.geocode enderecos.txt > coordenadas.csv   (um endereço por linha; "-" = stdin)
+    if len(sys.argv) != 2:
+        sys.exit("uso: python -m utils.geocode <arquivo.txt | ->")
+    entrada = sys.stdin if sys.argv[1] == "-" else open(sys.argv[1], encoding="utf-8")
+    with entrada:
+        linhas = [linha.strip() for linha in entrada]
+    saida = csv.writer(sys.stdout)
+    saida.writerow(["endereco", "lat", "lon", "formatado"])
+    for addr, res in geocode_many(linhas):
+        saida.writerow([addr, *(res if res else ("", "", ""))])
+        sys.stdout.flush()
@@ -1,4 +1,6 @@
+import re
 import unicodedata
+from typing import Optional
 import numpy as np
 import pandas as pd
 
@@ -17,6 +19,99 @@ def normalizar_sigla(sigla: str) -> str:
         s = s[2:]
     return s
 
+def normalizar_nome(nome: str) -> str:
+    """Nome de pessoa para comparação: sem acento, casefold, espaços únicos."""
+    if not isinstance(nome, str):
+        return ""
+    return " ".join(strip_accents(nome).casefold().split())
+
+# Abreviações comuns de logradouro/títulos em endereços brasileiros
+# (já sem acento e em minúsculas, como saem de normalizar_endereco)
+ABREVIACOES_ENDERECO = {
+    "r": "rua", "av": "avenida", "ave": "avenida", "avda": "avenida",
+    "estr": "estrada", "est": "estrada", "tv": "travessa", "trav": "travessa",
+    "pc": "praca", "pca": "praca", "al": "alameda",
+    "rod": "rodovia", "lgo": "largo", "lg": "largo", "lad": "ladeira",
+    "ld": "ladeira", "vl": "vila", "jd": "jardim", "jdm": "jardim",
+    "pq": "parque", "cond": "condominio", "conj": "conjunto",
+    "sta": "santa", "sto": "santo", "dr": "doutor", "prof": "professor",
+    "pres": "presidente", "gen": "general", "gal": "general",
+    "mal": "marechal", "cel": "coronel", "eng": "engenheiro",
+}
+# Marcadores de número ("nº 10", "n. 10", "num 10") — descartados antes de dígitos
+_MARCADORES_NUMERO = {"n", "no", "nro", "num", "numero"}
+_CEP_RE = re.compile(r"(?<!\d)(\d{5})[-.\s]?(\d{3})(?!\d)")
+
+def extrair_cep(s: str):
+    """('texto sem o CEP', 'CEP só dígitos' ou None)."""
+    if not isinstance(s, str):
+        return s, None
+    m = _CEP_RE.search(s)
+    if not m:
+        return s, None
+    return s[:m.start()] + " " + s[m.end():], m.group(1) + m.group(2)
+
+def normalizar_endereco(endereco: str) -> str:
+    """
+    Forma canônica de um endereço digitado (chave de cache):
+    sem acento, casefold, pontuação/espaços colapsados, abreviações de
+    logradouro expandidas (R. -> rua, Av. -> avenida, Estr. -> estrada...)
+    e CEP extraído para o fim ("...|20040002").
+    "Rua X, 10 - Centro" e "rua x 10 centro" viram a mesma chave.
+    """
+    if not isinstance(endereco, str):
+        return ""
+    s = strip_accents(endereco).casefold()
+    s, cep = extrair_cep(s)
+    tokens = re.sub(r"[^a-z0-9]+", " ", s).split()
+
+    out = []
+    for i, t in enumerate(tokens):
+        if t == "cep":
+            continue
+        if t in _MARCADORES_NUMERO and i + 1 < len(tokens) and tokens[i + 1][0].isdigit():
+            continue
+        out.append(ABREVIACOES_ENDERECO.get(t, t))
+
+    texto = " ".join(out)
+    return f"{texto}|{cep}" if cep else texto
+
+def to_numeric_series(s: pd.Series) -> pd.Series:
+    """
+    Converte a série para float de forma segura:
+    - Normaliza vírgula para ponto
+    - Converte texto inválido para NaN (sem levantar exceção)
+    Resultado: dtype float64 com NaN (np.nan) onde inválido.
+    """
+    if s is None:
+        return pd.Series(dtype="float64")
+    s2 = (
+        s.astype(str)
+         .str.strip()
+         .str.replace(",", ".", regex=False)
+         .replace({"": None, "nan": None, "None": None, "-": None, "—": None})
+    )
+    # Converte qualquer coisa não numérica para NaN
+    return pd.to_numeric(s2, errors="coerce")
+
+def find_col(df: pd.DataFrame, candidates: list[str]) -> Optional[str]:
+    """Acha coluna por nome exato (case-insensitive) ou contendo o termo."""
+    if df is None or df.empty:
+        return None
+    cols_lc_map = {c.lower(): c for c in df.columns}
+    # Match exato
+    for cand in candidates:
+        key = cand.lower()
+        if key in cols_lc_map:
+            return cols_lc_map[key]
+    # Match contendo
+    for c in df.columns:
+        lc = c.lower()
+        for cand in candidates:
+            if cand.lower() in lc:
+                return c
+    return None
+
 def levenshtein(a: str, b: str) -> int:
     if a == b:
         return 0
@@ -35,6 +130,88 @@ def levenshtein(a: str, b: str) -> int:
         prev = curr
     return prev[-1]
 
+def levenshtein_limitado(a: str, b: str, limite: int) -> int:
+    """
+    Levenshtein com faixa (banda) de largura 'limite' em volta da diagonal.
+    Retorna a distância exata se ela for <= limite; caso contrário retorna
+    limite + 1 assim que nenhuma célula da linha ainda cabe no limite.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    if not a or not b:
+        return max(len(a), len(b))
+    fora = limite + 1
+    prev = [j if j <= limite else fora for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        ini = max(1, i - limite)
+        fim = min(len(b), i + limite)
+        curr = [fora] * (len(b) + 1)
+        if i <= limite:
+            curr[0] = i
+        menor = curr[0]
+        for j in range(ini, fim + 1):
+            v = min(prev[j] + 1, curr[j-1] + 1, prev[j-1] + (ca != b[j-1]))
+            curr[j] = v if v < fora else fora
+            if curr[j] < menor:
+                menor = curr[j]
+        if menor > limite:
+            return fora
+        prev = curr
+    return prev[-1] if prev[-1] <= limite else fora
+
+def codificar_strings(strings) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Codifica uma lista de strings uma única vez para levenshtein_many:
+    matriz (n, maior_len) de code points uint32 com padding 0 + comprimentos.
+    """
+    arr = np.asarray(list(strings), dtype=str)
+    if arr.size == 0:
+        return np.zeros((0, 0), dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    largura = arr.dtype.itemsize // 4
+    codigos = arr.view(np.uint32).reshape(len(arr), largura)
+    comprimentos = np.char.str_len(arr).astype(np.int32)
+    return codigos, comprimentos
+
+def levenshtein_many(query: str, candidatos) -> np.ndarray:
+    """
+    Distância de 'query' para TODOS os candidatos de uma vez.
+    'candidatos' pode ser lista de strings ou o par já codificado por
+    codificar_strings (recomendado: codifique o inventário uma vez só).
+    DP coluna a coluna (um caractere dos candidatos por passo), vetorizado
+    entre candidatos; a cadeia de inserções de cada coluna sai de um
+    mínimo acumulado, sem laço Python sobre a query.
+    """
+    if isinstance(candidatos, tuple):
+        codigos, comprimentos = candidatos
+    else:
+        codigos, comprimentos = codificar_strings(candidatos)
+
+    n = len(comprimentos)
+    m = len(query)
+    q = np.frombuffer(query.encode("utf-32-le"), dtype=np.uint32)[:, None]
+    passo = np.arange(1, m + 1, dtype=np.int16)[:, None]
+    # Layout (posição na query, candidato): cada operação varre linhas contíguas
+    codigos_t = np.ascontiguousarray(codigos.T)
+
+    res = np.full(n, m, dtype=np.int16)  # candidatos vazios
+    col = np.repeat(np.arange(m + 1, dtype=np.int16)[:, None], n, axis=1)
+    base = np.empty((m + 1, n), dtype=np.int16)
+    maior = int(comprimentos.max()) if n else 0
+    for j in range(1, maior + 1):
+        diferente = codigos_t[j-1][None, :] != q
+        # sem inserção: substituição (diagonal) ou remoção (coluna anterior)
+        tmp = np.minimum(col[:-1] + diferente, col[1:] + 1)
+        # com inserções: new[i] = i + min(j, min_{k<i}(tmp[k] - (k+1)))
+        base[0] = j
+        np.subtract(tmp, passo, out=base[1:])
+        np.minimum.accumulate(base, axis=0, out=col)
+        col[1:] += passo
+        terminou = comprimentos == j
+        res[terminou] = col[m, terminou]
+    return res
+
 def haversine_km(lat1, lon1, lat2, lon2):
     R = 6371.0088
     lat1 = np.radians(lat1); lon1 = np.radians(lon1)
@@ -43,4 +220,75 @@ def haversine_km(lat1, lon1, lat2, lon2):
     dlat = lat2 - lat1
     dlon = lon2 - lon1
     a = np.sin(dlat/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin(dlon/2)**2
-    return R * 2 * np.arcsin(np.sqrt(a))
\ No newline at end of file
+    return R * 2 * np.arcsin(np.sqrt(a))
+
+def preparar_sitios(lat, lon, dtype=np.float32) -> dict:
+    """
+    Pré-cálculo dos sítios (ERBs) para haversine_top_k, feito uma vez:
+    senos/cossenos de meia latitude e meia longitude e cos(lat) no dtype
+    do kernel, mais lat/lon em float64 para a distância final exata.
+    """
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    fi, la = np.radians(lat) / 2, np.radians(lon) / 2
+    return {
+        "lat": lat,
+        "lon": lon,
+        "sen_fi": np.sin(fi).astype(dtype),
+        "cos_fi": np.cos(fi).astype(dtype),
+        "sen_la": np.sin(la).astype(dtype),
+        "cos_la": np.cos(la).astype(dtype),
+        "cos_lat": np.cos(2 * fi).astype(dtype),
+    }
+
+def haversine_top_k(lat, lon, sitios: dict, k: int, memoria_mb: float = 64.0,
+                    folga: int = 2) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Os k sítios mais próximos de CADA origem (muitas origens × muitos sítios)
+    sem montar a matriz inteira: as origens vão em blocos de linhas cujo
+    tamanho respeita 'memoria_mb'. Dentro do bloco só há multiplicações
+    (sin(Δ/2) = sin(b/2)cos(a/2) - cos(b/2)sin(a/2), com os senos/cossenos
+    pré-calculados) e argpartition; os k + folga candidatos de cada origem
+    são reordenados com haversine_km em float64 (desempate pela posição),
+    o que neutraliza a perda de precisão quando o kernel roda em float32.
+    Retorna (índices em 'sitios', distâncias em km), shape (n_origens, k).
+    """
+    lat = np.atleast_1d(np.asarray(lat, dtype="float64"))
+    lon = np.atleast_1d(np.asarray(lon, dtype="float64"))
+    n, m = len(lat), len(sitios["lat"])
+    k = min(k, m)
+    idx_out = np.empty((n, k), dtype=np.intp)
+    dist_out = np.empty((n, k), dtype="float64")
+    if n == 0 or k == 0:
+        return idx_out, dist_out
+
+    dtype = sitios["sen_fi"].dtype
+    orig = preparar_sitios(lat, lon, dtype=dtype)
+    kc = min(k + folga, m)
+    # ~4 matrizes temporárias (bloco × m) vivas ao mesmo tempo
+    linhas = max(1, int(memoria_mb * 2**20 // (4 * m * dtype.itemsize)))
+
+    for ini in range(0, n, linhas):
+        b = slice(ini, ini + linhas)
+        sdlat = np.multiply.outer(orig["cos_fi"][b], sitios["sen_fi"])
+        sdlat -= np.multiply.outer(orig["sen_fi"][b], sitios["cos_fi"])
+        sdlon = np.multiply.outer(orig["cos_la"][b], sitios["sen_la"])
+        sdlon -= np.multiply.outer(orig["sen_la"][b], sitios["cos_la"])
+        # a = sin²(Δlat/2) + cos(lat1)·cos(lat2)·sin²(Δlon/2)  (mesma ordem da distância)
+        sdlat *= sdlat
+        sdlon *= sdlon
+        sdlon *= sitios["cos_lat"]
+        sdlon *= orig["cos_lat"][b, None]
+        sdlat += sdlon
+        del sdlon
+
+        if kc < m:
+            cand = np.argpartition(sdlat, kc - 1, axis=1)[:, :kc]
+        else:
+            cand = np.broadcast_to(np.arange(m), sdlat.shape)
+        del sdlat
+        d = haversine_km(lat[b, None], lon[b, None], sitios["lat"][cand], sitios["lon"][cand])
+        ordem = np.lexsort((cand, d), axis=-1)[:, :k]  # por distância, depois posição
+        idx_out[b] = np.take_along_axis(cand, ordem, axis=1)
+        dist_out[b] = np.take_along_axis(d, ordem, axis=1)
+    return idx_out, dist_out
@@ -0,0 +1,159 @@
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# =========================================================
+#  Cliente HTTP compartilhado (geocode, OSRM, ...)
+# =========================================================
+#
+# Uma requests.Session por provedor: conexões keep-alive reaproveitadas
+# (sem novo handshake TCP+TLS a cada busca), timeout de conexão/leitura
+# sempre definido, poucas tentativas com backoff exponencial em erros
+# transitórios e um disjuntor (circuit breaker) por provedor: depois de
+# N falhas seguidas o provedor é pulado por alguns segundos, em vez de
+# cada busca esperar o timeout inteiro.
+#
+# As novas tentativas (429/5xx) são feitas aqui, não pelo urllib3: cada
+# uma passa de novo pelo disjuntor e pela 'vez' do chamador (limitador de
+# taxa), então o retry também respeita o limite de uso do provedor.
+# Timeout de leitura NÃO é repetido: o pior caso de uma chamada é um
+# timeout, não (tentativas + 1) timeouts. O urllib3 só repete falhas de
+# conexão (a requisição nem chegou ao servidor).
+
+TIMEOUT_PADRAO = (3.05, 10.0)  # (conexão, leitura) em segundos
+STATUS_TRANSITORIOS = (429, 500, 502, 503, 504)
+# Retry-After maior que isso: devolve a resposta em vez de esperar
+ESPERA_MAX_RETRY_S = 5.0
+
+
+class CircuitoAberto(requests.RequestException):
+    """Provedor com falhas seguidas: chamadas suspensas temporariamente."""
+
+
+class _Disjuntor:
+    def __init__(self, limite_falhas: int, espera_s: float):
+        self.limite_falhas = limite_falhas
+        self.espera_s = espera_s
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        # Aberto: passado o tempo de espera deixa passar UMA chamada de
+        # teste (meio-aberto) e empurra o prazo, barrando as demais até ela
+        # terminar: um sucesso fecha o circuito, uma falha o reabre. Se o
+        # teste nunca voltar, outro passa depois de espera_s.
+        with self._lock:
+            if self._falhas < self.limite_falhas:
+                return True
+            agora = time.monotonic()
+            if agora < self._aberto_ate:
+                return False
+            self._aberto_ate = agora + self.espera_s
+            return True
+
+    def sucesso(self):
+        with self._lock:
+            self._falhas = 0
+            self._aberto_ate = 0.0
+
+    def falha(self):
+        with self._lock:
+            self._falhas += 1
+            if self._falhas >= self.limite_falhas:
+                self._aberto_ate = time.monotonic() + self.espera_s
+
+
+class ClienteHTTP:
+    def __init__(
+        self,
+        provedor: str,
+        timeout=TIMEOUT_PADRAO,
+        tentativas: int = 2,
+        backoff_s: float = 0.3,
+        conexoes: int = 10,
+        limite_falhas: int = 5,
+        espera_s: float = 30.0,
+        headers: Optional[dict] = None,
+    ):
+        self.provedor = provedor
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.backoff_s = backoff_s
+        self.disjuntor = _Disjuntor(limite_falhas, espera_s)
+
+        # Só falhas de conexão; status e leitura ficam com _requisitar
+        retry = Retry(total=None, connect=tentativas, read=0, status=0, other=0,
+                      redirect=3, backoff_factor=backoff_s)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=conexoes, max_retries=retry)
+        self.sessao = requests.Session()
+        self.sessao.mount("https://", adapter)
+        self.sessao.mount("http://", adapter)
+        if headers:
+            self.sessao.headers.update(headers)
+
+    def _requisitar(self, metodo: str, url: str, vez: Optional[Callable[[], None]] = None,
+                    **kwargs) -> requests.Response:
+        """
+        'vez': chamada antes de CADA tentativa (ex.: pegar um token do
+        limitador de taxa); pode levantar RequestException para desistir.
+        Só GET é repetido (em 429/5xx); POST sai uma vez.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        tentativas = self.tentativas if metodo == "GET" else 0
+        for i in range(tentativas + 1):
+            if not self.disjuntor.permitir():
+                raise CircuitoAberto(f"{self.provedor}: indisponível (circuito aberto)")
+            if vez is not None:
+                vez()
+            try:
+                r = self.sessao.request(metodo, url, **kwargs)
+            except requests.RequestException:
+                self.disjuntor.falha()
+                raise
+            if r.status_code not in STATUS_TRANSITORIOS:
+                self.disjuntor.sucesso()
+                return r
+            self.disjuntor.falha()
+
+            espera = _retry_after(r)
+            if espera is None:
+                espera = self.backoff_s * 2 ** i
+            if i == tentativas or espera > ESPERA_MAX_RETRY_S:
+                return r
+            r.close()
+            time.sleep(espera)
+        return r
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self._requisitar("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self._requisitar("POST", url, **kwargs)
+
+
+def _retry_after(r: requests.Response) -> Optional[float]:
+    """Retry-After em segundos (a forma com data HTTP é ignorada)."""
+    try:
+        return max(0.0, float(r.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+_clientes: dict[str, ClienteHTTP] = {}
+_clientes_lock = threading.Lock()
+
+
+def cliente(provedor: str, **opcoes) -> ClienteHTTP:
+    """Cliente único por provedor no processo (opções valem na 1ª chamada)."""
+    c = _clientes.get(provedor)
+    if c is None:
+        with _clientes_lock:
+            c = _clientes.get(provedor)
+            if c is None:
+                c = _clientes[provedor] = ClienteHTTP(provedor, **opcoes)
+    return c
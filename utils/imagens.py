@@ -0,0 +1,72 @@
+import io
+from typing import Optional
+
+# =========================================================
+#  Derivados das fotos de cadeados (miniatura + versão web)
+# =========================================================
+#
+# A galeria mostra a miniatura; o original (muitas vezes um JPEG/HEIC de
+# vários MB do celular) só é carregado sob demanda. Os derivados saem com
+# a orientação EXIF já aplicada e sem metadados (GPS etc.).
+# HEIC/HEIF precisa do pacote opcional pillow-heif; sem ele (ou sem o
+# Pillow) os derivados simplesmente não são gerados.
+
+THUMB_LADO = 320    # maior lado da miniatura (px)
+WEB_LADO = 1600     # maior lado da versão web (px)
+QUALIDADE_THUMB = 70
+QUALIDADE_WEB = 80
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow ausente: sem derivados
+    Image = None
+else:
+    try:
+        from pillow_heif import register_heif_opener
+        register_heif_opener()
+    except ImportError:
+        pass
+
+
+def formato_derivado() -> tuple[str, str, str]:
+    """(formato Pillow, extensão, MIME) dos derivados: WebP se disponível, senão JPEG."""
+    if Image is not None and features.check("webp"):
+        return "WEBP", "webp", "image/webp"
+    return "JPEG", "jpg", "image/jpeg"
+
+
+def gerar_derivados(origem) -> Optional[dict[str, bytes]]:
+    """
+    {"thumb": bytes, "web": bytes} a partir da foto original ('origem' =
+    bytes, caminho ou arquivo aberto). None se não for possível abrir a
+    imagem (formato não suportado, arquivo corrompido, Pillow ausente).
+    """
+    if Image is None:
+        return None
+    if isinstance(origem, (bytes, bytearray)):
+        origem = io.BytesIO(origem)
+
+    try:
+        with Image.open(origem) as img:
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGB")
+            formato, _, _ = formato_derivado()
+            return {
+                "thumb": _reduzir(img, THUMB_LADO, formato, QUALIDADE_THUMB),
+                "web": _reduzir(img, WEB_LADO, formato, QUALIDADE_WEB),
+            }
+    except Exception:
+        return None
+
+
+def _reduzir(img, lado: int, formato: str, qualidade: int) -> bytes:
+    copia = img.copy()
+    copia.thumbnail((lado, lado), Image.LANCZOS)  # nunca amplia
+    buf = io.BytesIO()
+    opcoes = {"quality": qualidade}
+    if formato == "JPEG":
+        opcoes.update(optimize=True, progressive=True)
+    else:
+        opcoes["method"] = 4
+    copia.save(buf, formato, **opcoes)
+    return buf.getvalue()
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional
+
+# =========================================================
+#  Ingestão de fotos por conteúdo (SHA-256)
+# =========================================================
+#
+# O upload é copiado em blocos para um arquivo temporário enquanto o hash
+# é calculado (memória constante, mesmo para HEIC grandes). O nome final
+# é o próprio hash: reenviar a mesma foto não grava um segundo arquivo.
+# Quem chama pode ainda recusar um conteúdo já registrado (ex.: mesma
+# foto com outra extensão) antes de o temporário ganhar o nome final.
+
+BLOCO = 1 << 20  # 1 MiB
+
+
+def ingerir(origem: BinaryIO, pasta: Path, extensao: str,
+            duplicada: Optional[Callable[[str], bool]] = None) -> tuple[str, Optional[Path], bool]:
+    """
+    Grava 'origem' (arquivo aberto, lido do início) em pasta/<sha256>.<ext>.
+    Retorna (sha256, caminho final, novo). novo=False quando o mesmo
+    conteúdo já existia na pasta — nada é regravado.
+    'duplicada(sha256)' é consultada antes do nome final: se True, o
+    temporário é apagado e o retorno é (sha256, None, False).
+    """
+    pasta.mkdir(parents=True, exist_ok=True)
+    extensao = extensao.lower().lstrip(".") or "bin"
+    h = hashlib.sha256()
+
+    origem.seek(0)
+    fd, tmp = tempfile.mkstemp(dir=pasta, prefix=".ingest-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for parte in iter(lambda: origem.read(BLOCO), b""):
+                h.update(parte)
+                f.write(parte)
+
+        sha = h.hexdigest()
+        if duplicada is not None and duplicada(sha):
+            return sha, None, False
+        destino = pasta / f"{sha}.{extensao}"
+        if destino.exists():
+            return sha, destino, False
+        os.replace(tmp, destino)
+        tmp = None
+        return sha, destino, True
+    finally:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
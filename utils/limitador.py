@@ -0,0 +1,120 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from utils.banco import BancoSQLite
+
+# =========================================================
+#  Limitador de taxa (token bucket) por provedor
+# =========================================================
+#
+# O estado do balde fica num SQLite compartilhado: todos os threads e
+# processos (workers do Streamlit, CLI em lote) respeitam o MESMO limite.
+# Cada chamada só espera quando o balde está vazio, e apenas o tempo que
+# falta para o próximo token — nada de sleep fixo antes de cada request.
+# Se o SQLite não puder ser usado, cai para um balde só deste processo.
+
+LIMITES_PATH = Path("data/limites.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS baldes (
+    nome       TEXT PRIMARY KEY,
+    tokens     REAL NOT NULL,
+    atualizado REAL NOT NULL
+);
+"""
+
+
+class LimitadorTaxa(BancoSQLite):
+    # Arquivo aberto só na 1ª chamada: se falhar, vale o balde em memória
+    SCHEMA = _SCHEMA
+
+    def __init__(self, nome: str, taxa_por_s: float, capacidade: float = 1.0,
+                 path: Path = LIMITES_PATH):
+        super().__init__(path)
+        self.nome = nome
+        self.taxa_por_s = taxa_por_s
+        self.capacidade = capacidade
+        # fallback em memória (só deste processo)
+        self._lock = threading.Lock()
+        self._tokens = capacidade
+        self._atualizado = time.time()
+
+    def _repor(self, tokens: float, atualizado: float, agora: float) -> float:
+        return min(self.capacidade, tokens + max(0.0, agora - atualizado) * self.taxa_por_s)
+
+    def _tentar(self) -> float:
+        """Consome 1 token se houver; retorna 0 ou quantos segundos faltam."""
+        try:
+            con = self._con()
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                agora = time.time()
+                row = con.execute(
+                    "SELECT tokens, atualizado FROM baldes WHERE nome = ?", (self.nome,)
+                ).fetchone()
+                tokens = self._repor(*row, agora) if row else self.capacidade
+                espera = 0.0
+                if tokens >= 1.0:
+                    tokens -= 1.0
+                else:
+                    espera = (1.0 - tokens) / self.taxa_por_s
+                con.execute(
+                    "INSERT OR REPLACE INTO baldes (nome, tokens, atualizado) VALUES (?, ?, ?)",
+                    (self.nome, tokens, agora),
+                )
+                con.execute("COMMIT")
+                return espera
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError):
+            with self._lock:
+                agora = time.time()
+                self._tokens = self._repor(self._tokens, self._atualizado, agora)
+                self._atualizado = agora
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return 0.0
+                return (1.0 - self._tokens) / self.taxa_por_s
+
+    def adquirir(self, timeout: Optional[float] = None,
+                 cancelar: Optional[threading.Event] = None) -> bool:
+        """
+        Bloqueia só o necessário até obter um token.
+        Retorna False se o timeout estourar ou 'cancelar' for sinalizado
+        antes disso (nesse caso nenhum token é consumido).
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if cancelar is not None and cancelar.is_set():
+                return False
+            espera = self._tentar()
+            if espera <= 0:
+                return True
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+            if cancelar is None:
+                time.sleep(espera)
+            elif cancelar.wait(espera):
+                return False
+
+
+_limitadores: dict[str, LimitadorTaxa] = {}
+_limitadores_lock = threading.Lock()
+
+
+def limitador(nome: str, taxa_por_s: float, capacidade: float = 1.0) -> LimitadorTaxa:
+    """Limitador único por provedor no processo (parâmetros valem na 1ª chamada)."""
+    lim = _limitadores.get(nome)
+    if lim is None:
+        with _limitadores_lock:
+            lim = _limitadores.get(nome)
+            if lim is None:
+                lim = _limitadores[nome] = LimitadorTaxa(nome, taxa_por_s, capacidade)
+    return lim
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from utils.data_loader import obter_inventario
+from utils.helpers import find_col, to_numeric_series
+from utils.ranking import N_OUTROS, adicionar_rotas, ranquear_varias
+
+# =========================================================
+#  Processamento em lote: endereços/coordenadas -> ERBs
+# =========================================================
+#
+#   python -m utils.lote chamados.csv saida.csv [--lote 500] [--processos 4] [--sem-rota]
+#
+# Entrada CSV ou XLSX com coluna de endereço e/ou colunas lat/lon.
+# A entrada é lida em blocos (CSV em streaming; XLSX é lido de uma vez,
+# o openpyxl não permite ler por partes pelo pandas). O processo principal
+# geocodifica o bloco seguinte enquanto os processos auxiliares ranqueiam
+# os anteriores; a saída (CSV) é gravada na ordem da entrada, bloco a bloco,
+# com no máximo 2 blocos pendentes por processo em memória.
+# As rotas passam pelo limitador do OSRM (OSRM_REQ_POR_S, somando todos
+# os processos): com o servidor público, lotes grandes saem quase todos
+# com rota estimada — use --sem-rota ou um OSRM próprio (OSRM_URL).
+
+TAMANHO_LOTE = 500
+
+COLUNAS_SAIDA = [
+    "linha", "entrada", "lat_origem", "lon_origem", "status", "ordem",
+    "sigla", "nome", "detentora", "endereco", "lat", "lon",
+    "capacitado", "capacitado_forcado", "dist_km", "dist_rota_km", "tempo_min", "rota_estimada",
+]
+# Colunas do DataFrame ranqueado, na ordem de COLUNAS_SAIDA a partir de "sigla"
+_COLUNAS_ERB = [
+    "sigla", "nome", "detentora", "endereco", "lat", "lon",
+    "_is_capacitado", "_is_forced_cap", "dist_km", "dist_rota_km", "tempo_min", "rota_estimada",
+]
+
+
+def _ler_blocos(path: Path, tamanho: int) -> Iterator[pd.DataFrame]:
+    if path.suffix.lower() in (".xlsx", ".xls"):
+        df = pd.read_excel(path, dtype=str)
+        for ini in range(0, len(df), tamanho):
+            yield df.iloc[ini:ini + tamanho]
+    else:
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=tamanho, sep=None, engine="python")
+
+
+def _origens(bloco: pd.DataFrame, inicio: int) -> list[tuple]:
+    """
+    (linha, entrada, lat, lon) por linha do bloco; lat/lon None se não
+    localizado. 'entrada' é o endereço ou, sem ele, as células lat/lon
+    como vieram no arquivo.
+    """
+    bloco = bloco.rename(columns=lambda c: str(c).strip().lower())
+    col_end = find_col(bloco, ["endereco", "endereço", "address"])
+    col_lat = find_col(bloco, ["lat", "latitude"])
+    col_lon = find_col(bloco, ["lon", "lng", "longitude"])
+    if not col_end and not (col_lat and col_lon):
+        raise ValueError("a entrada precisa de uma coluna 'endereco' ou das colunas 'lat' e 'lon'")
+
+    n = len(bloco)
+    lat = to_numeric_series(bloco[col_lat]).tolist() if col_lat and col_lon else [float("nan")] * n
+    lon = to_numeric_series(bloco[col_lon]).tolist() if col_lat and col_lon else [float("nan")] * n
+    enderecos = bloco[col_end].fillna("").astype(str).str.strip().tolist() if col_end else [""] * n
+    if col_lat and col_lon:
+        brutas = [
+            f"{a}, {b}" if a or b else ""
+            for a, b in zip(bloco[col_lat].fillna("").astype(str).str.strip(),
+                            bloco[col_lon].fillna("").astype(str).str.strip())
+        ]
+    else:
+        brutas = [""] * n
+
+    # Geocodifica só o que veio sem coordenada válida
+    pendentes = [e for e, la, lo in zip(enderecos, lat, lon) if e and not (la == la and lo == lo)]
+    achados = {}
+    if pendentes:
+        from utils.geocode import geocode_many  # só quem precisa paga o import
+        achados = dict(geocode_many(pendentes))
+
+    out = []
+    for i, (end, bruta, la, lo) in enumerate(zip(enderecos, brutas, lat, lon)):
+        if not (la == la and lo == lo):
+            geo = achados.get(end)
+            la, lo = (geo[0], geo[1]) if geo else (None, None)
+        out.append((inicio + i + 1, end or bruta, la, lo))
+    return out
+
+
+# ---------- Lado dos processos auxiliares ----------
+
+def _processar_bloco(origens: list[tuple], n_outros: int, rotas: bool) -> list[list]:
+    inv = obter_inventario()  # uma carga por processo (reaproveitada nos blocos seguintes)
+    validas = [o for o in origens if o[2] is not None]
+    final = ranquear_varias(
+        inv.enderecos, inv.espacial, inv.espacial_cap,
+        [o[2] for o in validas], [o[3] for o in validas], n_outros=n_outros,
+    )
+    final["dist_km"] = final["dist_km"].round(3)
+    final["dist_rota_km"] = None
+    final["tempo_min"] = None
+    final["rota_estimada"] = None
+    if rotas:
+        for _, grupo in final.groupby("origem", sort=False):
+            _, _, lat, lon = validas[int(grupo["origem"].iat[0])]
+            com_rota = adicionar_rotas(grupo.copy(), lat, lon)
+            colunas = ["dist_rota_km", "tempo_min", "rota_estimada"]
+            final.loc[grupo.index, colunas] = com_rota[colunas].to_numpy(dtype=object)
+
+    # Linhas da saída agrupadas por origem, na ordem de 'final'
+    por_origem: dict[int, list] = {}
+    for r in final[["origem", *_COLUNAS_ERB]].itertuples(index=False, name=None):
+        por_origem.setdefault(r[0], []).append(r[1:])
+
+    linhas = []
+    vazio = [""] * (len(COLUNAS_SAIDA) - 5)
+    i = 0
+    for linha, entrada, lat, lon in origens:
+        if lat is None:
+            linhas.append([linha, entrada, "", "", "endereço não localizado", *vazio])
+            continue
+        erbs = por_origem.get(i, [])
+        i += 1
+        if not erbs:
+            linhas.append([linha, entrada, lat, lon, "nenhuma ERB com coordenadas", *vazio])
+        for ordem, r in enumerate(erbs, start=1):
+            linhas.append([linha, entrada, lat, lon, "ok", ordem, *r])
+    # pd.NA/None -> célula vazia no CSV
+    return [["" if v is None or v is pd.NA else v for v in lin] for lin in linhas]
+
+
+# ---------- Orquestração ----------
+
+def processar_arquivo(
+    entrada: Path,
+    saida,
+    tamanho_lote: int = TAMANHO_LOTE,
+    processos: Optional[int] = None,
+    n_outros: int = N_OUTROS,
+    rotas: bool = True,
+) -> int:
+    """Processa 'entrada' e grava o CSV em 'saida' (arquivo texto). Retorna nº de linhas lidas."""
+    processos = processos or os.cpu_count() or 1
+    escritor = csv.writer(saida)
+    escritor.writerow(COLUNAS_SAIDA)
+
+    lidas = 0
+    pendentes: deque = deque()
+    with ProcessPoolExecutor(max_workers=processos) as ex:
+        for bloco in _ler_blocos(entrada, tamanho_lote):
+            origens = _origens(bloco, lidas)
+            lidas += len(bloco)
+            pendentes.append(ex.submit(_processar_bloco, origens, n_outros, rotas))
+            while len(pendentes) >= 2 * processos:
+                escritor.writerows(pendentes.popleft().result())
+        while pendentes:
+            escritor.writerows(pendentes.popleft().result())
+    return lidas
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    p = argparse.ArgumentParser(
+        prog="python -m utils.lote",
+        description="Ranqueia as ERBs mais próximas (capacitado + vizinhos) para cada linha de um CSV/XLSX.",
+    )
+    p.add_argument("entrada", type=Path, help="CSV ou XLSX com 'endereco' e/ou 'lat'/'lon'")
+    p.add_argument("saida", help="CSV de saída ('-' = stdout)")
+    p.add_argument("--lote", type=int, default=TAMANHO_LOTE, help="linhas por bloco")
+    p.add_argument("--processos", type=int, default=None, help="processos auxiliares (padrão: nº de CPUs)")
+    p.add_argument("--n-outros", type=int, default=N_OUTROS, help="vizinhos além do capacitado")
+    p.add_argument("--sem-rota", action="store_true", help="sem distância/tempo de rota (só linha reta)")
+    args = p.parse_args(argv)
+
+    if args.saida == "-":
+        n = processar_arquivo(args.entrada, sys.stdout, args.lote, args.processos, args.n_outros, not args.sem_rota)
+    else:
+        with open(args.saida, "w", newline="", encoding="utf-8") as saida:
+            n = processar_arquivo(args.entrada, saida, args.lote, args.processos, args.n_outros, not args.sem_rota)
+    print(f"{n} linhas processadas", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
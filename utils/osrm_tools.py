@@ -1,22 +1,232 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
 import requests
 import streamlit as st
 
-@st.cache_data
+from utils.config import obter_config
+from utils.helpers import haversine_km
+from utils.http_client import cliente
+from utils.limitador import limitador
+from utils.rotacache import CacheRotas
+
+# =========================================================
+#  Roteamento: backends intercambiáveis
+# =========================================================
+#
+#   ROTEADOR=osrm        (padrão) servidor OSRM público de demonstração
+#   ROTEADOR=osrm        + OSRM_URL=http://localhost:5000  -> OSRM próprio
+#   ROTEADOR=estimativa  sem rede: só o estimador local
+#
+# Com OSRM, o estimador local cobre os pares que o servidor não respondeu
+# (lento, fora do ar, circuito aberto); esses resultados saem marcados
+# com "estimado": True.
+
+OSRM_PUBLICO = "https://router.project-osrm.org"
+OSRM_URL = (obter_config("OSRM_URL", "") or OSRM_PUBLICO).strip().rstrip("/")
+ROTEADOR = str(obter_config("ROTEADOR", "osrm")).strip().lower()
+# Leitura curta e sem nova tentativa: passado disso a página segue com a estimativa
+OSRM_TIMEOUT_S = float(obter_config("OSRM_TIMEOUT_S", 4.0))
+# Limite de uso do servidor (compartilhado entre sessões e processos,
+# inclusive os do lote). O público de demonstração não aguenta rajadas;
+# 0 = sem limite (OSRM próprio). Sem vez em OSRM_TIMEOUT_S: estimativa.
+OSRM_REQ_POR_S = float(obter_config("OSRM_REQ_POR_S", 1.0 if OSRM_URL == OSRM_PUBLICO else 0))
+
+# Origem arredondada para uma grade de ~OSRM_GRADE_GRAUS (0.001° ≈ 110 m):
+# buscas a poucos metros uma da outra caem na mesma célula e reaproveitam
+# as rotas já calculadas para as mesmas ERBs.
+OSRM_GRADE_GRAUS = float(obter_config("OSRM_GRADE_GRAUS", 0.001))
+# Máximo de coordenadas por /table (o servidor público aceita 100, incluindo a origem)
+OSRM_MAX_COORDENADAS = int(obter_config("OSRM_MAX_COORDENADAS", 100))
+
+ROTAS_CACHE_PATH = Path(obter_config("ROTAS_CACHE_PATH", "data/rotas_cache.sqlite"))
+ROTAS_CACHE_TTL_DIAS = float(obter_config("ROTAS_CACHE_TTL_DIAS", 30))
+ROTAS_CACHE_TTL_NEGATIVO_H = 24.0
+ROTAS_CACHE_MAX = int(obter_config("ROTAS_CACHE_MAX", 200000))
+
+
+@st.cache_resource(show_spinner=False)
+def _cache() -> CacheRotas:
+    return CacheRotas(
+        ROTAS_CACHE_PATH,
+        ttl_s=ROTAS_CACHE_TTL_DIAS * 86400,
+        ttl_negativo_s=ROTAS_CACHE_TTL_NEGATIVO_H * 3600,
+        max_itens=ROTAS_CACHE_MAX,
+    )
+
+
+def celula_origem(lat: float, lon: float) -> tuple[str, float, float]:
+    """(chave da célula, lat, lon do centro da célula) para a origem."""
+    i, j = round(lat / OSRM_GRADE_GRAUS), round(lon / OSRM_GRADE_GRAUS)
+    return f"{i}:{j}", i * OSRM_GRADE_GRAUS, j * OSRM_GRADE_GRAUS
+
+
+def _centro_celula(celula: str) -> tuple[float, float]:
+    i, j = celula.split(":")
+    return int(i) * OSRM_GRADE_GRAUS, int(j) * OSRM_GRADE_GRAUS
+
+
+def _chave_destino(lat: float, lon: float) -> str:
+    return f"{lat:.6f},{lon:.6f}"
+
+
+# =========================================================
+#  Backends
+# =========================================================
+#
+# Todo backend expõe:
+#   nome: str
+#   um_para_muitos(lat0, lon0, destinos) -> lista de (distância_m, duração_s)
+#       ou None por destino (sem rota); None inteiro = backend falhou.
+
+class BackendOSRM:
+    """Servidor OSRM (público ou próprio), endpoint /table 1×N."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.nome = "osrm" if url == OSRM_PUBLICO else "osrm-proprio"
+
+    def um_para_muitos(self, lat0: float, lon0: float, destinos: list) -> Optional[list]:
+        coords = [(lon0, lat0)] + [(lon, lat) for lat, lon in destinos]
+        coord_str = ";".join(f"{x:.6f},{y:.6f}" for x, y in coords)
+
+        try:
+            r = cliente(self.nome, timeout=(3.05, OSRM_TIMEOUT_S), tentativas=0).get(
+                f"{self.url}/table/v1/driving/{coord_str}",
+                params={
+                    "annotations": "duration,distance",
+                    "sources": "0",
+                    "destinations": ";".join(str(i) for i in range(1, len(coords))),
+                },
+                vez=self._aguardar_vez if OSRM_REQ_POR_S > 0 else None,
+            )
+            data = r.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+        # Erro do servidor ou resposta incompleta (ex.: sem 'durations'): falhou
+        if not isinstance(data, dict) or data.get("code") != "Ok":
+            return None
+        durations = (data.get("durations") or [None])[0]
+        distances = (data.get("distances") or [None])[0]
+        if durations is None or distances is None or len(durations) != len(destinos) or len(distances) != len(destinos):
+            return None
+        return [
+            (m, d) if m is not None and d is not None else None
+            for d, m in zip(durations, distances)
+        ]
+
+    def _aguardar_vez(self):
+        if not limitador(self.nome, OSRM_REQ_POR_S).adquirir(timeout=OSRM_TIMEOUT_S):
+            raise requests.RequestException(f"{self.nome}: sem vez no limite de uso")
+
+
+class EstimadorRotas:
+    """
+    Estimativa local, sem rede: distância em linha reta × fator de desvio
+    e velocidade média, ambos por faixa de distância. Calibrado com as
+    rotas reais do cache (mediana por faixa); faixas com poucas amostras
+    usam os valores padrão abaixo.
+    """
+
+    nome = "estimativa"
+
+    FAIXAS_KM = (2.0, 5.0, 10.0, 25.0, 50.0, np.inf)
+    FATOR_PADRAO = (1.45, 1.4, 1.35, 1.3, 1.25, 1.2)
+    VELOCIDADE_PADRAO_KMH = (18.0, 24.0, 30.0, 40.0, 55.0, 70.0)
+    MIN_AMOSTRAS = 20
+
+    def __init__(self, amostras: list[tuple[str, str, float, float]] = ()):
+        self.fator = np.array(self.FATOR_PADRAO)
+        self.velocidade = np.array(self.VELOCIDADE_PADRAO_KMH)
+        self.amostras_por_faixa = np.zeros(len(self.FAIXAS_KM), dtype=int)
+        if amostras:
+            self._calibrar(amostras)
+
+    def _calibrar(self, amostras):
+        origem = np.array([_centro_celula(c) for c, _, _, _ in amostras])
+        destino = np.array([[float(x) for x in d.split(",")] for _, d, _, _ in amostras])
+        rota_km = np.array([m for _, _, m, _ in amostras]) / 1000
+        horas = np.array([s for _, _, _, s in amostras]) / 3600
+        reta_km = haversine_km(origem[:, 0], origem[:, 1], destino[:, 0], destino[:, 1])
+
+        ok = (reta_km > 0.05) & (rota_km > 0) & (horas > 0)
+        faixa = np.searchsorted(self.FAIXAS_KM, reta_km)
+        for f in range(len(self.FAIXAS_KM)):
+            sel = ok & (faixa == f)
+            self.amostras_por_faixa[f] = int(sel.sum())
+            if self.amostras_por_faixa[f] >= self.MIN_AMOSTRAS:
+                self.fator[f] = float(np.clip(np.median(rota_km[sel] / reta_km[sel]), 1.0, 3.0))
+                self.velocidade[f] = float(np.clip(np.median(rota_km[sel] / horas[sel]), 5.0, 110.0))
+
+    def um_para_muitos(self, lat0: float, lon0: float, destinos: list) -> list:
+        if not destinos:
+            return []
+        lat = np.array([d[0] for d in destinos], dtype=float)
+        lon = np.array([d[1] for d in destinos], dtype=float)
+        reta_km = haversine_km(lat0, lon0, lat, lon)
+        faixa = np.searchsorted(self.FAIXAS_KM, reta_km)
+        rota_km = reta_km * self.fator[faixa]
+        horas = rota_km / self.velocidade[faixa]
+        return [(float(m), float(s)) for m, s in zip(rota_km * 1000, horas * 3600)]
+
+
+@st.cache_resource(show_spinner=False, ttl=3600)
+def estimador() -> EstimadorRotas:
+    """Estimador recalibrado a cada hora com as rotas reais do cache."""
+    return EstimadorRotas(_cache().amostra())
+
+
+@st.cache_resource(show_spinner=False)
+def backend() -> Optional[BackendOSRM]:
+    """Backend remoto configurado (None quando ROTEADOR=estimativa)."""
+    return None if ROTEADOR == "estimativa" else BackendOSRM(OSRM_URL)
+
+
+# =========================================================
+#  Tabela origem -> destinos
+# =========================================================
+
 def osrm_table(origin_lat, origin_lon, destinos):
-    coords = [(origin_lon, origin_lat)] + [(lon, lat) for lat, lon in destinos]
-    coord_str = ";".join(f"{x},{y}" for x, y in coords)
+    """
+    Rota da origem até cada destino [(lat, lon), ...], na mesma ordem:
+    [{"duration_min", "distance_km", "estimado"}, ...].
+    Consulta o cache por par (célula da origem, destino) e só pede ao
+    backend os pares que faltam, em tabelas de até OSRM_MAX_COORDENADAS.
+    O que o backend não respondeu sai do estimador local (estimado=True);
+    pares que o OSRM diz não ter rota vêm com os valores None.
+    """
+    celula, lat0, lon0 = celula_origem(origin_lat, origin_lon)
+    chaves = [_chave_destino(lat, lon) for lat, lon in destinos]
+    rotas = _cache().obter(celula, chaves)
 
-    url = f"https://router.project-osrm.org/table/v1/driving/{coord_str}"
-    r = requests.get(url, params={"annotations": "duration,distance"})
-    data = r.json()
+    faltando = list({k: (lat, lon) for k, (lat, lon) in zip(chaves, destinos) if k not in rotas}.items())
+    remoto = backend()
+    if remoto is not None:
+        por_req = max(1, OSRM_MAX_COORDENADAS - 1)
+        for ini in range(0, len(faltando), por_req):
+            parte = faltando[ini:ini + por_req]
+            novas = remoto.um_para_muitos(lat0, lon0, [d for _, d in parte])
+            if novas is None:
+                break  # backend fora: o resto vai para a estimativa
+            valores = dict(zip((k for k, _ in parte), novas))
+            _cache().salvar(celula, valores)
+            rotas.update(valores)
 
-    durations = data["durations"][0][1:]
-    distances = data["distances"][0][1:]
+    # Estimativas não entram no cache (ele é a base de calibração)
+    sem_resposta = [(k, d) for k, d in faltando if k not in rotas]
+    estimadas = dict(zip(
+        (k for k, _ in sem_resposta),
+        estimador().um_para_muitos(origin_lat, origin_lon, [d for _, d in sem_resposta]),
+    ))
 
     out = []
-    for d, m in zip(durations, distances):
+    for k in chaves:
+        r = rotas.get(k, estimadas.get(k))
         out.append({
-            "duration_min": round(d / 60),
-            "distance_km": round(m / 1000, 2),
+            "duration_min": round(r[1] / 60) if r else None,
+            "distance_km": round(r[0] / 1000, 2) if r else None,
+            "estimado": k in estimadas,
         })
     return out
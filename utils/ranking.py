@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from utils.espacial import IndiceEspacial, selecionar_com_capacitado, selecionar_com_capacitado_lote
+from utils.osrm_tools import osrm_table
+
+# =========================================================
+#  Motor de ranqueamento "ERBs mais próximas"
+# =========================================================
+#
+# Mesma regra usada na busca por endereço e no processamento em lote
+# (utils.lote): SEMPRE o capacitado mais próximo + os N vizinhos gerais,
+# com distância em linha reta e, opcionalmente, rota/tempo (utils.osrm_tools).
+
+N_OUTROS = 2
+
+
+def ranquear_erbs(
+    df: pd.DataFrame,
+    espacial: IndiceEspacial,
+    espacial_cap: IndiceEspacial,
+    lat: float,
+    lon: float,
+    n_outros: int = N_OUTROS,
+) -> pd.DataFrame:
+    """
+    Linhas de 'df' selecionadas para a origem (lat, lon), na ordem de
+    exibição, com as colunas extras:
+      - dist_km:        distância em linha reta (haversine)
+      - _is_forced_cap: True no capacitado incluído pela regra
+    """
+    posicoes, dists, forcado = selecionar_com_capacitado(espacial, espacial_cap, lat, lon, n_outros=n_outros)
+    final = df.iloc[posicoes].reset_index(drop=True)
+    final["dist_km"] = dists
+    final["_is_forced_cap"] = forcado
+    return final
+
+
+def ranquear_varias(
+    df: pd.DataFrame,
+    espacial: IndiceEspacial,
+    espacial_cap: IndiceEspacial,
+    lats,
+    lons,
+    n_outros: int = N_OUTROS,
+) -> pd.DataFrame:
+    """
+    Versão em bloco de ranquear_erbs para muitas origens: um único
+    DataFrame com a coluna 'origem' (índice da origem em lats/lons) e as
+    mesmas colunas extras, montado com um só iloc (em vez de um DataFrame
+    por origem, que domina o tempo em lotes grandes). As distâncias saem
+    do kernel em blocos (k_nearest_lote), não de uma busca por origem.
+    """
+    pos, dist, forcado = selecionar_com_capacitado_lote(espacial, espacial_cap, lats, lons, n_outros=n_outros)
+    final = df.iloc[pos.ravel()].reset_index(drop=True)
+    final.insert(0, "origem", np.repeat(np.arange(len(pos)), pos.shape[1]))
+    final["dist_km"] = dist.ravel()
+    final["_is_forced_cap"] = forcado.ravel()
+    return final
+
+
+def adicionar_rotas(final: pd.DataFrame, lat: float, lon: float) -> pd.DataFrame:
+    """
+    Colunas dist_rota_km / tempo_min / rota_estimada (in place, devolve o
+    próprio DataFrame). rota_estimada=True quando o roteador não respondeu
+    e os valores vieram do estimador local; sem rota ficam vazias (None).
+    """
+    destinos = list(zip(final["lat"].astype(float).tolist(), final["lon"].astype(float).tolist()))
+    osrm_out = osrm_table(lat, lon, destinos) if destinos else []
+
+    if osrm_out and len(osrm_out) == len(final):
+        final["dist_rota_km"] = [x["distance_km"] for x in osrm_out]
+        final["tempo_min"] = [x["duration_min"] for x in osrm_out]
+        final["rota_estimada"] = [x["estimado"] for x in osrm_out]
+    else:
+        final["dist_rota_km"] = None
+        final["tempo_min"] = None
+        final["rota_estimada"] = False
+    return final
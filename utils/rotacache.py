@@ -0,0 +1,101 @@
+import sqlite3
+import time
+
+from utils.banco import CacheSQLite
+
+# =========================================================
+#  Cache persistente de rotas por par (SQLite)
+# =========================================================
+#
+# Uma linha por (célula de origem, destino): a origem é arredondada para
+# uma grade pequena (ver osrm_tools.celula_origem), então buscas vizinhas
+# reaproveitam as rotas já calculadas para as mesmas ERBs. Pares sem rota
+# (OSRM devolve null) ficam guardados com TTL menor. Conexões, TTL e
+# limite de tamanho: utils.banco.CacheSQLite.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rotas (
+    celula      TEXT NOT NULL,
+    destino     TEXT NOT NULL,
+    distancia_m REAL,
+    duracao_s   REAL,
+    criado      REAL NOT NULL,
+    acessado    REAL NOT NULL,
+    PRIMARY KEY (celula, destino)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rotas_acessado ON rotas (acessado);
+"""
+
+
+class CacheRotas(CacheSQLite):
+    SCHEMA = _SCHEMA
+    TABELA = "rotas"
+    COLUNAS_CHAVE = ("celula", "destino")
+    # Destinos por SELECT (limite de parâmetros do SQLite)
+    LOTE_CONSULTA = 500
+
+    def obter(self, celula: str, destinos: list[str]) -> dict:
+        """
+        {destino: (distância_m, duração_s)} para os pares válidos no cache;
+        pares sem rota cacheados vêm como None. Ausentes não aparecem.
+        """
+        rows = []
+        try:
+            for ini in range(0, len(destinos), self.LOTE_CONSULTA):
+                parte = destinos[ini:ini + self.LOTE_CONSULTA]
+                marcas = ",".join("?" * len(parte))
+                rows += self._con().execute(
+                    f"SELECT destino, distancia_m, duracao_s, criado, acessado FROM rotas "
+                    f"WHERE celula = ? AND destino IN ({marcas})",
+                    (celula, *parte),
+                ).fetchall()
+        except sqlite3.Error:
+            return {}
+
+        agora = time.time()
+        out, acessados, chaves = {}, [], []
+        for destino, dist, dur, criado, acessado in rows:
+            if not self._valido(criado, dist is None, agora):
+                continue
+            out[destino] = None if dist is None else (dist, dur)
+            acessados.append(acessado)
+            chaves.append((celula, destino))
+        self._tocar(acessados, chaves, agora)
+        return out
+
+    def salvar(self, celula: str, valores: dict) -> None:
+        """valores: {destino: (distância_m, duração_s) ou None (sem rota)}."""
+        if not valores:
+            return
+        agora = time.time()
+        linhas = [
+            (celula, destino, *(v if v else (None, None)), agora, agora)
+            for destino, v in valores.items()
+        ]
+        try:
+            con = self._con()
+            con.execute("BEGIN")
+            con.executemany(
+                "INSERT OR REPLACE INTO rotas (celula, destino, distancia_m, duracao_s, criado, acessado) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+            con.execute("COMMIT")
+        except sqlite3.Error:
+            try:
+                self._con().execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            return
+        self._gravou()
+
+    def amostra(self, limite: int = 20000) -> list[tuple[str, str, float, float]]:
+        """Pares com rota real (célula, destino, distância_m, duração_s), os mais recentes."""
+        try:
+            return self._con().execute(
+                "SELECT celula, destino, distancia_m, duracao_s FROM rotas "
+                "WHERE distancia_m IS NOT NULL ORDER BY criado DESC LIMIT ?",
+                (limite,),
+            ).fetchall()
+        except sqlite3.Error:
+            return []
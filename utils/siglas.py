@@ -0,0 +1,122 @@
+from bisect import bisect_left
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.helpers import codificar_strings, levenshtein_limitado, levenshtein_many, normalizar_sigla
+
+# Maior code point possível: "prefixo + _FIM" fecha o intervalo do prefixo
+_FIM = chr(0x10FFFF)
+
+# Raio máximo respondido pelo índice de deleções; acima disso, varredura
+# completa com levenshtein_many
+RAIO_INDEXADO = 1
+
+
+def _delecoes(s: str, raio: int) -> set[str]:
+    """'s' e todas as variantes com até 'raio' caracteres removidos."""
+    nivel, todas = {s}, {s}
+    for _ in range(raio):
+        nivel = {v[:i] + v[i + 1:] for v in nivel for i in range(len(v))}
+        todas |= nivel
+    return todas
+
+
+class IndiceSiglas:
+    """
+    Índice das SIGLAs do inventário, montado uma vez junto com os dados.
+      - originais: SIGLAs únicas em uppercase, ordenadas (lista de exibição)
+      - norma_de:  SIGLA original -> normalizar_sigla(s)
+      - por_norm:  normalizar_sigla(s) -> SIGLA original
+      - normas/_orig_ord: pares (normalizada, original) ordenados, para
+        busca por prefixo com bisect (O(log n) + tamanho do resultado)
+      - posicoes:  SIGLA original -> posições (iloc) das linhas no DataFrame
+      - fuzzy:     SIGLAs normalizadas únicas já codificadas para levenshtein_many
+      - _por_delecao: variante com até RAIO_INDEXADO deleções -> SIGLAs
+        normalizadas (índice "symmetric delete"): se lev(a, b) <= k, a e b
+        têm uma variante em comum com até k deleções cada. A busca por raio
+        só confere (levenshtein_limitado) as chaves que dividem variante
+        com a consulta — uma fração pequena do inventário.
+    """
+
+    def __init__(self, siglas: pd.Series):
+        upper = siglas.astype("string").str.upper().reset_index(drop=True)
+        self.posicoes: dict[str, np.ndarray] = {
+            str(k): np.asarray(v) for k, v in upper.groupby(upper, sort=True).indices.items()
+        }
+        self.originais: list[str] = sorted(self.posicoes)
+
+        self.norma_de: dict[str, str] = {s: normalizar_sigla(s) for s in self.originais}
+        self.por_norm: dict[str, str] = {}
+        for s, n in self.norma_de.items():
+            self.por_norm.setdefault(n, s)
+
+        pares = sorted((n, s) for s, n in self.norma_de.items())
+        self.normas: list[str] = [n for n, _ in pares]
+        self._orig_ord: list[str] = [s for _, s in pares]
+
+        self._originais_de: dict[str, list[str]] = {}
+        for n, s in pares:
+            self._originais_de.setdefault(n, []).append(s)
+        self._normas_unicas: list[str] = list(self._originais_de)
+        self.fuzzy = codificar_strings(self._normas_unicas)
+
+        self._por_delecao: dict[str, list[str]] = {}
+        for n in self._normas_unicas:
+            for v in _delecoes(n, RAIO_INDEXADO):
+                self._por_delecao.setdefault(v, []).append(n)
+
+    def __len__(self) -> int:
+        return len(self.originais)
+
+    def exata(self, busca: str) -> Optional[str]:
+        """SIGLA original cujo normalizado é igual ao da busca (O(1))."""
+        return self.por_norm.get(normalizar_sigla(busca))
+
+    def linhas(self, sigla: str) -> np.ndarray:
+        """Posições (iloc) das linhas da SIGLA original (O(1))."""
+        return self.posicoes.get(sigla, np.empty(0, dtype=np.intp))
+
+    def por_prefixo(self, bnorm: str, limite: Optional[int] = None) -> list[str]:
+        """SIGLAs cujo normalizado começa com 'bnorm' (já normalizado)."""
+        ini = bisect_left(self.normas, bnorm)
+        fim = bisect_left(self.normas, bnorm + _FIM, lo=ini)
+        if limite is not None:
+            fim = min(fim, ini + limite)
+        return self._orig_ord[ini:fim]
+
+    def contendo(self, bnorm: str, limite: int, excluir: set[str]) -> list[str]:
+        """SIGLAs cujo normalizado contém 'bnorm' (varredura sem re-normalizar)."""
+        out = []
+        for n, s in zip(self.normas, self._orig_ord):
+            if len(out) >= limite:
+                break
+            if bnorm in n and s not in excluir:
+                out.append(s)
+        return out
+
+    def proximas(self, bnorm: str, k: int) -> list[tuple[int, str]]:
+        """(distância, SIGLA original) a até k edições de 'bnorm', ordenadas."""
+        if k <= RAIO_INDEXADO:
+            candidatas = {
+                n for v in _delecoes(bnorm, k) for n in self._por_delecao.get(v, ())
+            }
+            pares = ((levenshtein_limitado(bnorm, n, k), n) for n in candidatas)
+        else:
+            dist = levenshtein_many(bnorm, self.fuzzy)
+            pares = ((int(dist[i]), self._normas_unicas[i]) for i in np.flatnonzero(dist <= k))
+        return sorted((d, s) for d, n in pares if d <= k for s in self._originais_de[n])
+
+    def mais_proxima(self, bnorm: str) -> Optional[str]:
+        """SIGLA de menor distância (desempate alfabético)."""
+        if not self._normas_unicas:
+            return None
+        # Raios pequenos pelo índice; sem nada por perto, varredura completa
+        for k in range(RAIO_INDEXADO + 1):
+            achadas = self.proximas(bnorm, k)
+            if achadas:
+                return achadas[0][1]
+        dist = levenshtein_many(bnorm, self.fuzzy)
+        empatadas = np.flatnonzero(dist == dist.min())
+        return min(s for i in empatadas for s in self._originais_de[self._normas_unicas[i]])
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# =========================================================
+#  Snapshot colunar (.npz) das tabelas normalizadas
+# =========================================================
+#
+# Cada coluna vira um array NumPy próprio dentro do .npz (comprimido):
+#   - texto  -> array unicode de largura fixa + máscara de nulos
+#   - número -> float64 (NaN preservado)
+# O arquivo guarda também o "meta" (JSON) com a chave da planilha de
+# origem (mtime, tamanho e SHA-256) e a ordem das colunas de cada tabela.
+# Nada é salvo com pickle: leitura sempre com allow_pickle=False.
+
+SNAPSHOT_VERSAO = 1
+
+
+def caminho_snapshot(origem: Path) -> Path:
+    """'enderecos.xlsx' -> 'enderecos.snapshot.npz' (mesma pasta)."""
+    return origem.with_name(f"{origem.stem}.snapshot.npz")
+
+
+def hash_arquivo(path: Path, bloco: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for parte in iter(lambda: f.read(bloco), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def assinatura_arquivo(path: Path) -> dict:
+    """Assinatura barata (sem ler o conteúdo): mtime em ns + tamanho."""
+    st_ = path.stat()
+    return {"mtime_ns": st_.st_mtime_ns, "tamanho": st_.st_size}
+
+
+def _ler_meta(npz) -> dict:
+    return json.loads(str(npz["__meta__"]))
+
+
+def ler_snapshot(origem: Path, assinatura: Optional[dict] = None) -> Optional[dict[str, pd.DataFrame]]:
+    """
+    Devolve as tabelas do snapshot se ele corresponder à planilha atual
+    ('assinatura': a já tirada pelo chamador; senão é lida agora).
+    - Mesmo mtime + tamanho: confia sem ler a planilha.
+    - Senão compara o SHA-256 (ex.: arquivo copiado/tocado sem mudar);
+      se bater, atualiza a assinatura gravada e reaproveita.
+    Retorna None quando não existe, está corrompido ou ficou obsoleto.
+    """
+    snap = caminho_snapshot(origem)
+    if not snap.exists() or not origem.exists():
+        return None
+
+    try:
+        with np.load(snap, allow_pickle=False) as npz:
+            meta = _ler_meta(npz)
+            if meta.get("versao") != SNAPSHOT_VERSAO:
+                return None
+
+            if assinatura is None:
+                assinatura = assinatura_arquivo(origem)
+            if meta.get("assinatura") != assinatura:
+                if meta.get("sha256") != hash_arquivo(origem):
+                    return None
+                _regravar_assinatura(snap, npz, meta, assinatura)
+
+            return {
+                nome: _decodificar_tabela(npz, nome, colunas)
+                for nome, colunas in meta["tabelas"].items()
+            }
+    except Exception:
+        return None
+
+
+def gravar_snapshot(origem: Path, tabelas: dict[str, pd.DataFrame],
+                    assinatura: dict, sha256: str) -> None:
+    """
+    Grava o snapshot de forma atômica (arquivo temporário + os.replace).
+    'assinatura' e 'sha256' devem ter sido tirados ANTES de ler a planilha
+    que gerou 'tabelas': calculados depois, uma troca do arquivo durante a
+    leitura guardaria tabelas antigas sob a chave do arquivo novo.
+    """
+    meta = {
+        "versao": SNAPSHOT_VERSAO,
+        "assinatura": assinatura,
+        "sha256": sha256,
+        "tabelas": {},
+    }
+    arrays: dict[str, np.ndarray] = {}
+    for nome, df in tabelas.items():
+        meta["tabelas"][nome] = _codificar_tabela(df, nome, arrays)
+
+    _salvar_npz(caminho_snapshot(origem), meta, arrays)
+
+
+# =========================================================
+#  Codificação por coluna
+# =========================================================
+
+def _codificar_tabela(df: pd.DataFrame, nome: str, arrays: dict) -> list[list[str]]:
+    colunas = []
+    for col in df.columns:
+        s = df[col]
+        chave = f"{nome}/{col}"
+        if pd.api.types.is_float_dtype(s.dtype):
+            arrays[chave] = s.to_numpy(dtype="float64", na_value=np.nan)
+            colunas.append([col, "float"])
+        elif pd.api.types.is_bool_dtype(s.dtype):
+            arrays[chave] = s.to_numpy(dtype=bool)
+            colunas.append([col, "bool"])
+        else:
+            nulos = s.isna().to_numpy()
+            valores = s.astype("string").fillna("").to_numpy(dtype=str)
+            arrays[chave] = np.asarray(valores, dtype=str)
+            arrays[f"{chave}#na"] = nulos
+            colunas.append([col, "string"])
+    return colunas
+
+
+def _decodificar_tabela(npz, nome: str, colunas: list[list[str]]) -> pd.DataFrame:
+    dados = {}
+    for col, tipo in colunas:
+        chave = f"{nome}/{col}"
+        if tipo == "float":
+            dados[col] = pd.Series(npz[chave], dtype="float64")
+        elif tipo == "bool":
+            dados[col] = pd.Series(npz[chave], dtype=bool)
+        else:
+            s = pd.Series(npz[chave], dtype="string")
+            s[npz[f"{chave}#na"]] = pd.NA
+            dados[col] = s
+    return pd.DataFrame(dados)
+
+
+def _regravar_assinatura(snap: Path, npz, meta: dict, assinatura: dict) -> None:
+    meta = dict(meta, assinatura=assinatura)
+    arrays = {k: npz[k] for k in npz.files if k != "__meta__"}
+    try:
+        _salvar_npz(snap, meta, arrays)
+    except OSError:
+        pass  # sem permissão de escrita: segue usando o snapshot mesmo assim
+
+
+def _salvar_npz(destino: Path, meta: dict, arrays: dict) -> None:
+    tmp = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, __meta__=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, destino)